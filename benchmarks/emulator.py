@@ -0,0 +1,413 @@
+"""
+A stand-in for a Minecraft server, for tests and benchmarks that can't run a real one.
+
+`MinecraftEmulator` speaks three protocols:
+    - RCON, including authentication failures and responses fragmented into
+      4096 byte packets the same way vanilla does.
+    - The UDP query protocol, handshake and full stat.
+    - LiteBot-Mod's websocket frames, as a client of the bot's `/server/` route.
+
+`NetworkConditions` controls latency, jitter, packet loss and response sizes.
+Loss only applies to UDP, TCP retransmits are modelled as latency.
+
+As an asyncio fixture:
+
+    async with MinecraftEmulator(conditions=NetworkConditions(latency=0.01)) as mc:
+        pool = RconConnectionPool(loop, mc.host, mc.rcon_password, mc.rcon_port, 0)
+        ...
+
+The `lta` pytest fixture in `tests/conftest.py` runs the bot's `/server/` route against both sides of it.
+
+As a benchmark harness it runs the bot's RCON pool and query client against itself:
+
+    python -m benchmarks.emulator [--latency 2] [--jitter 1] [--loss 0.01] [--size 64] [--players 20]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import struct
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+MAX_FRAGMENT_SIZE = 4096
+SERVERDATA_RESPONSE_VALUE = 0
+SERVERDATA_AUTH_RESPONSE = 2
+SERVERDATA_EXECCOMMAND = 2
+SERVERDATA_AUTH = 3
+QUERY_MAGIC = b"\xfe\xfd"
+QUERY_HANDSHAKE = 9
+QUERY_STAT = 0
+
+
+@dataclass
+class NetworkConditions:
+    """
+    The conditions the emulator responds under, latencies are in seconds
+    """
+    latency: float = 0.0
+    jitter: float = 0.0
+    loss: float = 0.0
+    response_size: int = 64
+    players: int = 10
+
+    def delay(self) -> float:
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def dropped(self) -> bool:
+        return random.random() < self.loss
+
+
+class MinecraftEmulator:
+    """Emulates the network side of a Minecraft server
+
+    Args:
+        host: The address to listen on
+        rcon_password: The password RCON clients must authenticate with
+        conditions: The network conditions to respond under, these can be changed while running
+        commands: Handlers for specific commands, taking the command and returning the response.
+            Other commands get a response of `conditions.response_size` bytes
+        rcon_port: The port for RCON, 0 picks a free one
+        query_port: The port for query, 0 picks a free one
+    """
+
+    def __init__(self, host: str = "127.0.0.1", rcon_password: str = "emulator", *,
+                 conditions: Optional[NetworkConditions] = None,
+                 commands: Optional[dict[str, Callable[[str], str]]] = None,
+                 rcon_port: int = 0, query_port: int = 0):
+        self.host = host
+        self.rcon_password = rcon_password
+        self.conditions = conditions or NetworkConditions()
+        self.commands = commands or {}
+        self.rcon_port = rcon_port
+        self.query_port = query_port
+
+        self.rcon_commands = 0
+        self.queries = 0
+        self.dropped = 0
+
+        self._rcon_server: Optional[asyncio.AbstractServer] = None
+        self._query_transport: Optional[asyncio.DatagramTransport] = None
+        self._challenges: dict[tuple[str, int], int] = {}
+
+    async def __aenter__(self) -> MinecraftEmulator:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        self._rcon_server = await asyncio.start_server(self._handle_rcon, self.host, self.rcon_port)
+        self.rcon_port = self._rcon_server.sockets[0].getsockname()[1]
+
+        self._query_transport, _ = await loop.create_datagram_endpoint(
+            lambda: _QueryProtocol(self), local_addr=(self.host, self.query_port))
+        self.query_port = self._query_transport.get_extra_info("sockname")[1]
+
+    async def stop(self) -> None:
+        if self._rcon_server is not None:
+            self._rcon_server.close()
+            await self._rcon_server.wait_closed()
+            self._rcon_server = None
+
+        if self._query_transport is not None:
+            self._query_transport.close()
+            self._query_transport = None
+
+    def respond(self, command: str) -> str:
+        """
+        The response to an RCON command
+        """
+        name = command.split(" ", 1)[0]
+        if name in self.commands:
+            return self.commands[name](command)
+
+        return "x" * self.conditions.response_size
+
+    async def _handle_rcon(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        authenticated = False
+        try:
+            while True:
+                (length,) = struct.unpack("<i", await reader.readexactly(4))
+                req_id, req_type = struct.unpack("<ii", (payload := await reader.readexactly(length))[:8])
+                body = payload[8:-2].decode("utf8")
+                await asyncio.sleep(self.conditions.delay())
+
+                if req_type == SERVERDATA_AUTH:
+                    authenticated = body == self.rcon_password
+                    writer.write(_rcon_packet(req_id if authenticated else -1, SERVERDATA_AUTH_RESPONSE, b""))
+                elif not authenticated:
+                    break
+                elif req_type == SERVERDATA_EXECCOMMAND:
+                    self.rcon_commands += 1
+                    data = self.respond(body.removeprefix("/")).encode("utf8")
+                    fragments = [data[i:i + MAX_FRAGMENT_SIZE] for i in range(0, len(data), MAX_FRAGMENT_SIZE)]
+                    writer.write(b"".join(_rcon_packet(req_id, SERVERDATA_RESPONSE_VALUE, f) for f in fragments or [b""]))
+                else:
+                    # Vanilla answers anything else with an error, which clients use as a sentinel
+                    writer.write(_rcon_packet(req_id, SERVERDATA_RESPONSE_VALUE,
+                                              f"Unknown request {req_type:x}".encode("utf8")))
+
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _handle_query(self, data: bytes, addr: tuple[str, int]) -> None:
+        if self.conditions.dropped():
+            self.dropped += 1
+            return
+
+        if len(data) < 7 or data[:2] != QUERY_MAGIC:
+            return
+
+        packet_type, session = data[2], struct.unpack(">I", data[3:7])[0] & 0x0F0F0F0F
+        if packet_type == QUERY_HANDSHAKE:
+            token = self._challenges.setdefault(addr, random.randint(1, 2 ** 31 - 1))
+            response = bytes([QUERY_HANDSHAKE]) + struct.pack(">I", session) + str(token).encode() + b"\x00"
+        elif packet_type == QUERY_STAT and len(data) >= 11:
+            (token,) = struct.unpack(">i", data[7:11])
+            if token != self._challenges.get(addr):
+                # Unknown tokens are silently ignored
+                return
+            self.queries += 1
+            response = bytes([QUERY_STAT]) + struct.pack(">I", session) + self._full_stat()
+        else:
+            return
+
+        asyncio.get_running_loop().call_later(self.conditions.delay(), self._send_query_response, response, addr)
+
+    def _send_query_response(self, response: bytes, addr: tuple[str, int]) -> None:
+        if self._query_transport is not None and not self.conditions.dropped():
+            self._query_transport.sendto(response, addr)
+        else:
+            self.dropped += 1
+
+    def _full_stat(self) -> bytes:
+        players = self.conditions.players
+        info = {
+            "hostname": "A Minecraft Server", "gametype": "SMP", "game_id": "MINECRAFT", "version": "1.17.1",
+            "plugins": "", "map": "world", "numplayers": str(players), "maxplayers": str(players + 10),
+            "hostport": str(self.query_port), "hostip": self.host
+        }
+
+        data = b"splitnum\x00\x80\x00"
+        data += b"".join(k.encode() + b"\x00" + v.encode() + b"\x00" for k, v in info.items())
+        data += b"\x00\x01player_\x00\x00"
+        data += b"".join(f"Player{i}".encode() + b"\x00" for i in range(players))
+        return data + b"\x00"
+
+
+class _QueryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, emulator: MinecraftEmulator):
+        self.emulator = emulator
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        self.emulator._handle_query(data, addr)
+
+
+def _rcon_packet(req_id: int, req_type: int, body: bytes) -> bytes:
+    payload = struct.pack("<ii", req_id, req_type) + body + b"\x00\x00"
+    return struct.pack("<i", len(payload)) + payload
+
+
+class LiteBotModClient:
+    """Emulates LiteBot-Mod's side of the websocket connection to the bot
+
+    Every frame carries a JWT signed with the bot's `api_secret`, naming the server and the action.
+    Frames sent by the bot, such as messages and the command tree, are collected in `received`,
+    and the number of messages in each `messages` frame in `batches`.
+
+    Args:
+        url: The websocket URL of the bot's server route, such as `ws://localhost:8000/server/`
+        secret: The bot's `api_secret`
+        server_name: The name of the server to connect as
+        conditions: The network conditions to send frames under
+        codecs: The codecs to offer when connecting, in order of preference, plain JSON if not given
+        compression: The compression methods to offer when connecting
+        batching: Whether to accept several messages in a single `messages` frame
+    """
+
+    def __init__(self, url: str, secret: str, server_name: str, conditions: Optional[NetworkConditions] = None,
+                 codecs: Optional[list[str]] = None, compression: Optional[list[str]] = None, batching: bool = True):
+        self.url = url
+        self.secret = secret
+        self.server_name = server_name
+        self.conditions = conditions or NetworkConditions()
+        self.codecs = codecs
+        self.compression = compression
+        self.batching = batching
+        # The codec the bot picked, None for plain JSON
+        self.codec = None
+        self.received: list[dict] = []
+        self.batches: list[int] = []
+        # The events the bot has listeners for, as the bot last told us
+        self.subscriptions: Optional[set[str]] = None
+
+        self._socket = None
+        self._reader: Optional[asyncio.Task] = None
+        self._replies: dict[str, asyncio.Future] = {}
+        self._negotiated: Optional[asyncio.Future] = None
+        self._frame_received = asyncio.Event()
+
+    async def __aenter__(self) -> LiteBotModClient:
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def connect(self) -> None:
+        import websockets
+
+        self._socket = await websockets.connect(self.url)
+        self._reader = asyncio.get_running_loop().create_task(self._read())
+        # The first frame from a server only establishes the connection
+        if self.codecs is None:
+            return await self._send("connect", {"batching": self.batching})
+
+        self._negotiated = asyncio.get_running_loop().create_future()
+        await self._send("connect", {"codecs": self.codecs, "compression": self.compression or [],
+                                     "batching": self.batching})
+        # Everything after the bot's answer uses the negotiated codec
+        await asyncio.wait_for(self._negotiated, 5)
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+        if self._socket is not None:
+            await self._socket.close()
+
+    async def event(self, name: str, player: Optional[dict] = None, args: Optional[dict] = None) -> None:
+        """
+        Sends a server event, such as `on_player_join`, unless the bot has no listeners for it
+        """
+        if self.subscriptions is not None and name not in self.subscriptions:
+            return
+
+        await self._send("event", {"name": name, "player": json.dumps(player) if player else "", "args": args or {}})
+
+    async def command(self, name: str, player: dict, args: Optional[dict] = None) -> None:
+        """
+        Runs a server command as a player
+        """
+        await self._send("command", {"name": name, "player": json.dumps(player), "args": args or {}, "full_args": args or {}})
+
+    async def rpc(self, name: str, timeout: float = 5, **data) -> Any:
+        """
+        Calls an RPC method and waits for the bot's reply
+        """
+        return await asyncio.wait_for(self._send("rpc", {"name": name, **data}, reply=True), timeout)
+
+    async def wait_for(self, name: str, count: int = 1, timeout: float = 5) -> list[dict]:
+        """
+        Waits until the bot has sent at least `count` frames called `name`, and returns all of them
+        """
+        async def wait():
+            while len(frames := [f for f in self.received if f.get("name") == name]) < count:
+                self._frame_received.clear()
+                await self._frame_received.wait()
+            return frames
+
+        return await asyncio.wait_for(wait(), timeout)
+
+    async def _send(self, action: str, data: dict, reply: bool = False) -> Any:
+        import jwt
+
+        auth = jwt.encode({"server_name": self.server_name, "action": action, "nonce": random.random()},
+                          self.secret, algorithm="HS256")
+        await asyncio.sleep(self.conditions.delay())
+
+        future = None
+        if reply:
+            future = self._replies[auth] = asyncio.get_running_loop().create_future()
+
+        try:
+            frame = {"auth": auth, **data}
+            await self._socket.send(self.codec.encode(frame) if self.codec else json.dumps(frame))
+            if future is not None:
+                return await future
+        finally:
+            self._replies.pop(auth, None)
+
+    async def _read(self) -> None:
+        async for message in self._socket:
+            frame = self.codec.decode(message) if self.codec else json.loads(message)
+            future = self._replies.get(frame.get("id"))
+            if future is not None and not future.done():
+                future.set_result(frame.get("res"))
+            elif frame.get("name") == "codec":
+                from litebot.core.minecraft.codec import CODECS
+
+                negotiated = frame["data"]
+                self.codec = CODECS[negotiated["codec"]](negotiated["compression"],
+                                                         structured_text=negotiated["structured_text"])
+                self._negotiated.set_result(self.codec)
+            elif frame.get("name") == "messages":
+                self.batches.append(len(frame["data"]))
+                self.received.extend({"name": "message", "data": m} for m in frame["data"])
+            else:
+                if frame.get("name") == "server_event_subscriptions":
+                    self.subscriptions = set(frame["data"])
+                elif frame.get("name") == "message":
+                    self.batches.append(1)
+                self.received.append(frame)
+            self._frame_received.set()
+
+
+async def _benchmark(args: argparse.Namespace) -> None:
+    from litebot.core.minecraft.protocol import QueryClient, RconConnectionPool
+
+    loop = asyncio.get_running_loop()
+    conditions = NetworkConditions(latency=args.latency / 1000, jitter=args.jitter / 1000, loss=args.loss,
+                                   response_size=args.size, players=args.players)
+
+    async with MinecraftEmulator(conditions=conditions) as mc:
+        pool = RconConnectionPool(loop, mc.host, mc.rcon_password, mc.rcon_port, 0, size=args.pool_size)
+        start = time.perf_counter()
+        await asyncio.gather(*[pool.command("list") for _ in range(args.commands)])
+        elapsed = time.perf_counter() - start
+        pool.close()
+        print(f"rcon:  {args.commands} commands in {elapsed * 1000:8.1f} ms "
+              f"({elapsed / args.commands * 1e6:8.1f} us/command, pool of {args.pool_size})")
+
+        client = QueryClient(loop)
+        latencies, failures = [], 0
+        for _ in range(args.queries):
+            start = time.perf_counter()
+            try:
+                await client.query((mc.host, mc.query_port), timeout=1)
+                latencies.append(time.perf_counter() - start)
+            except asyncio.TimeoutError:
+                failures += 1
+        client.close()
+
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else float("nan")
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float("nan")
+        print(f"query: {args.queries} queries, {failures} timed out, p50 {p50:6.2f} ms p99 {p99:6.2f} ms, "
+              f"{client.stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=1.0, help="Response latency in milliseconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Latency jitter in milliseconds")
+    parser.add_argument("--loss", type=float, default=0.0, help="UDP packet loss, between 0 and 1")
+    parser.add_argument("--size", type=int, default=64, help="Size of each RCON response in bytes")
+    parser.add_argument("--players", type=int, default=20, help="Number of players in query responses")
+    parser.add_argument("--commands", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=2)
+    asyncio.run(_benchmark(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Measures the cost of encoding and decoding LiteBot-Mod websocket frames, and their size on the wire.
+
+Every available codec is compared against the previous encoding, stdlib `json` with chat
+messages built into strings by `Text.build` and embedded in the frame, which the mod
+then had to decode twice. The JSON codec uses orjson when it is installed, and MessagePack
+is only measured when msgpack is installed.
+
+Usage:
+    python -m benchmarks.lta_codec [--rounds 2000] [--commands 100]
+"""
+import argparse
+import json
+import time
+
+from litebot.core.minecraft.codec import CODECS, COMPRESSION_DEFLATE, orjson
+from litebot.core.minecraft.text import Colors, Text
+
+
+def _chat_message() -> Text:
+    return Text().add_component(text="[SMP] ", color=Colors.DARK_GRAY).add_component(
+        text="<").add_component(text="iDarkLightning", color=Colors.GRAY).add_component(
+        text="> ", color=Colors.WHITE).add_component(text="has anyone seen the witch farm?", color=Colors.WHITE)
+
+
+def _command_tree(commands: int) -> list[dict]:
+    """
+    A `server_command_registers` payload with `commands` commands, each with two arguments and a sub command
+    """
+    def argument(name):
+        return {"name": name, "type": "StringArgumentType", "optional": False, "full": name}
+
+    return [{
+        "name": f"command{i}", "OPLevel": 0,
+        "arguments": [argument("target"), argument("reason")],
+        "subs": [{"name": "sub", "OPLevel": 2, "arguments": [argument("value")], "subs": [], "full": f"command{i}.sub"}]
+    } for i in range(commands)]
+
+
+def _event() -> dict:
+    player = {"name": "iDarkLightning", "uuid": "0f6d8b2e-6b3b-4d0f-9e0e-2f1f6f1b8c2a",
+              "pos_x": 120.5, "pos_y": 64.0, "pos_z": -340.25, "dimension": "minecraft:overworld", "op_level": 4}
+    return {"auth": "e" * 160, "name": "on_message", "player": json.dumps(player), "args": {"message": "hello"}}
+
+
+def _time(func, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds
+
+
+def _report(name: str, encode, decode, rounds: int) -> None:
+    encoded = encode()
+    size = len(encoded.encode("utf8") if isinstance(encoded, str) else encoded)
+    print(f"    {name:<22} encode {_time(encode, rounds) * 1e6:8.1f} us  "
+          f"decode {_time(lambda: decode(encoded), rounds) * 1e6:8.1f} us  {size:>7} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--commands", type=int, default=100)
+    args = parser.parse_args()
+
+    codecs = {"json" + ("" if orjson else " (stdlib)"): CODECS["json"]}
+    if CODECS["msgpack"].available():
+        codecs["msgpack"] = CODECS["msgpack"]
+
+    text = _chat_message()
+    tree = _command_tree(args.commands)
+    event = _event()
+    frames = {
+        "message": (lambda: {"name": "message", "data": {"message": text.build()}},
+                    lambda: {"name": "message", "data": {"message": text.components()}}),
+        f"command tree ({args.commands})": (lambda: {"name": "server_command_registers", "data": tree},) * 2,
+        "event": (lambda: event,) * 2
+    }
+
+    for frame_name, (legacy_frame, frame) in frames.items():
+        print(f"{frame_name}:")
+
+        def legacy_decode(encoded):
+            decoded = json.loads(encoded)
+            if decoded.get("name") == "message":
+                decoded["data"]["message"] = json.loads(decoded["data"]["message"])
+            return decoded
+
+        _report("legacy json", lambda: json.dumps(legacy_frame()), legacy_decode, args.rounds)
+
+        for codec_name, codec_type in codecs.items():
+            for compression in (None, COMPRESSION_DEFLATE):
+                codec = codec_type(compression=compression, structured_text=True)
+                name = codec_name + (f" + {compression}" if compression else "")
+                _report(name, lambda: codec.encode(frame()), codec.decode, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Measures the cost of parsing full stat query responses.
+
+The current `ServerQuerier.parse_query` over the offset based `Connection` is
+compared against the previous parser, which read strings one byte at a time and
+reallocated the remaining buffer on every read.
+
+Usage:
+    python -m benchmarks.query_parser [--rounds 200]
+"""
+import argparse
+import struct
+import time
+
+from litebot.core.minecraft.protocol import Connection, ServerQuerier
+
+PLAYER_COUNTS = (10, 100, 1000)
+
+
+def _full_stat(players: int) -> bytes:
+    """
+    Builds a full stat response in the same layout as vanilla, with `players` names of 16 characters
+    """
+    info = {
+        "hostname": "A Minecraft Server", "gametype": "SMP", "game_id": "MINECRAFT", "version": "1.17.1",
+        "plugins": "", "map": "world", "numplayers": str(players), "maxplayers": str(players + 1),
+        "hostport": "25565", "hostip": "127.0.0.1"
+    }
+
+    data = b"\x00" + struct.pack(">I", 1) + b"splitnum\x00\x80\x00"
+    data += b"".join(k.encode() + b"\x00" + v.encode() + b"\x00" for k, v in info.items())
+    data += b"\x00\x01player_\x00\x00"
+    data += b"".join(f"Player_{i:09}".encode() + b"\x00" for i in range(players))
+    return data + b"\x00"
+
+
+class LegacyConnection:
+    """
+    The parts of `Connection` that the previous parser used
+    """
+    def __init__(self):
+        self.received = bytearray()
+
+    def receive(self, data):
+        self.received.extend(data)
+
+    def read(self, length):
+        result = self.received[:length]
+        self.received = self.received[length:]
+        return result
+
+    def read_ascii(self):
+        result = bytearray()
+        while len(result) == 0 or result[-1] != 0:
+            result.extend(self.read(1))
+        return result[:-1].decode("ISO-8859-1")
+
+
+def _legacy_parse(response: LegacyConnection):
+    response.read(len("splitnum") + 1 + 1 + 1)
+    data = {}
+    players = []
+
+    while True:
+        key = response.read_ascii()
+        if len(key) == 0:
+            response.read(1)
+            break
+        data[key] = response.read_ascii()
+
+    response.read(len("player_") + 1 + 1)
+
+    while True:
+        name = response.read_ascii()
+        if len(name) == 0:
+            break
+        players.append(name)
+
+    return data, players
+
+
+def _time(parse, connection_type, payload: bytes, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        connection = connection_type()
+        connection.receive(payload)
+        connection.read(1 + 4)
+        parse(connection)
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    for players in PLAYER_COUNTS:
+        payload = _full_stat(players)
+        legacy = _time(_legacy_parse, LegacyConnection, payload, args.rounds)
+        current = _time(ServerQuerier.parse_query, Connection, payload, args.rounds)
+        print(f"{players:>5} players ({len(payload):>6} bytes): legacy {legacy * 1e6:10.1f} us "
+              f"current {current * 1e6:8.1f} us ({legacy / current:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Measures the client side CPU cost of sending RCON commands.
+
+A minimal RCON responder runs in a separate process so that only the client's
+work is counted. The current `ServerRcon` is compared against the previous
+implementation, which read packets with `sock_recv` + `bytes` concatenation and
+polled `select()` after every packet to decide if a response was complete.
+
+The responder waits `--latency` milliseconds before answering. Over loopback with
+no latency the reply is usually already buffered when the client starts reading,
+which no real server manages and which hides the cost of waiting on the event loop.
+
+Usage:
+    python -m benchmarks.rcon_client [--commands 5000] [--size 64] [--latency 0.5]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import select
+import socket
+import struct
+import time
+
+from litebot.core.minecraft.protocol.rcon import ServerRcon, MAX_FRAGMENT_SIZE
+
+HOST = "127.0.0.1"
+PASSWORD = "benchmark"
+
+
+def _serve(port: int, response_size: int, latency: float, ready) -> None:
+    """
+    A blocking single connection RCON responder, fragments responses the same way vanilla does
+    """
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((HOST, port))
+    listener.listen()
+    ready.set()
+
+    body = b"x" * response_size
+    while True:
+        conn, _ = listener.accept()
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        stream = conn.makefile("rb")
+        try:
+            while header := stream.read(4):
+                (length,) = struct.unpack("<i", header)
+                req_id, req_type = struct.unpack("<ii", stream.read(length)[:8])
+                time.sleep(latency)
+
+                if req_type == 2:
+                    chunks = [body[i:i + MAX_FRAGMENT_SIZE] for i in range(0, len(body), MAX_FRAGMENT_SIZE)] or [b""]
+                else:
+                    chunks = [b""]
+
+                out = b""
+                for chunk in chunks:
+                    payload = struct.pack("<ii", req_id, 0) + chunk + b"\x00\x00"
+                    out += struct.pack("<i", len(payload)) + payload
+                conn.sendall(out)
+        finally:
+            conn.close()
+
+
+class LegacyRcon:
+    """
+    The packet reading loop that `ServerRcon` used before it moved to a buffered protocol
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop, port: int):
+        self.loop = loop
+        self.port = port
+        self.socket = None
+
+    async def connect(self):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setblocking(False)
+        await self.loop.sock_connect(self.socket, (HOST, self.port))
+        await self._send(3, PASSWORD)
+
+    async def command(self, command):
+        return await self._send(2, f"/{command}")
+
+    def disconnect(self):
+        self.socket.close()
+
+    async def _read(self, length):
+        data = b""
+        while len(data) < length:
+            data += await self.loop.sock_recv(self.socket, length - len(data))
+        return data
+
+    async def _send(self, out_type, out_data):
+        payload = struct.pack("<ii", 0, out_type) + out_data.encode("utf8") + b"\x00\x00"
+        await self.loop.sock_sendall(self.socket, struct.pack("<i", len(payload)) + payload)
+
+        in_data = ""
+        while True:
+            (in_length,) = struct.unpack("<i", await self._read(4))
+            in_payload = await self._read(in_length)
+            in_data += in_payload[8:-2].decode("utf8")
+
+            if len(select.select([self.socket], [], [], 0)[0]) == 0:
+                return in_data
+
+
+async def _run(client, commands: int) -> tuple[float, float]:
+    await client.connect()
+    # Warm up
+    for _ in range(100):
+        await client.command("list")
+
+    cpu, wall = time.process_time(), time.perf_counter()
+    for _ in range(commands):
+        await client.command("list")
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+
+    client.disconnect()
+    return cpu, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--commands", type=int, default=5000)
+    parser.add_argument("--size", type=int, default=64, help="Size of each response body in bytes")
+    parser.add_argument("--latency", type=float, default=0.5, help="Server response time in milliseconds")
+    parser.add_argument("--port", type=int, default=25599)
+    args = parser.parse_args()
+
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=_serve, args=(args.port, args.size, args.latency / 1000, ready), daemon=True)
+    server.start()
+    ready.wait()
+
+    loop = asyncio.new_event_loop()
+    try:
+        for name, client in (("legacy", LegacyRcon(loop, args.port)),
+                             ("current", ServerRcon(loop, HOST, PASSWORD, args.port))):
+            cpu, wall = loop.run_until_complete(_run(client, args.commands))
+            print(f"{name:>8}: {cpu / args.commands * 1e6:8.1f} us CPU/command "
+                  f"{wall / args.commands * 1e6:8.1f} us wall/command")
+    finally:
+        loop.close()
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+import asyncio
 import inspect
-from typing import TYPE_CHECKING
+from typing import Optional, TYPE_CHECKING
 
 from discord.ext.commands import Cog as DPYCog, CogMeta as DPYCogMeta, Command, Context
 from discord.ext.commands.cog import _cog_special_method
@@ -14,6 +15,8 @@ from litebot.core.settings import Setting, SettingTypes
 if TYPE_CHECKING:
     from litebot.litebot import LiteBot
 
+COG_REQUIREMENTS_TIMEOUT = 10
+
 class CogMeta(DPYCogMeta):
     def __new__(mcs, *args, **kwargs):
         name, bases, attrs = args
@@ -110,6 +113,7 @@ class Cog(DPYCog, metaclass=CogMeta):
     __cog_description__: str
     __cog_required__: bool
     _bot: LiteBot
+    _requirements_task: Optional[asyncio.Task]
 
     class ListenerTypes:
         DISCORD = "discord"
@@ -137,6 +141,7 @@ class Cog(DPYCog, metaclass=CogMeta):
         for command in self.__mc_commands__:
             command.update_cog_ref(self)
 
+        self._requirements_task = None
         return self
 
     def get_listeners(self):
@@ -144,6 +149,11 @@ class Cog(DPYCog, metaclass=CogMeta):
 
     @_cog_special_method
     def cog_requirements(self, bot):
+        """Checks whether the cog can be loaded
+
+        This can also be a coroutine, in which case the cog is only registered once it has
+        been awaited on the bot's loop, and it is given `COG_REQUIREMENTS_TIMEOUT` seconds to finish.
+        """
         return True
 
     @classmethod
@@ -214,19 +224,51 @@ class Cog(DPYCog, metaclass=CogMeta):
         self._inject(bot)
 
     def _inject(self, bot: LiteBot):
-        cls = self.__class__
         self._bot = bot
         bot.processing_plugin.cogs.append(self)
 
-        if not self.cog_requirements(bot):
+        requirements = self.cog_requirements(bot)
+        if inspect.isawaitable(requirements):
+            self._requirements_task = bot.loop.create_task(
+                self._inject_when_ready(bot, bot.processing_plugin, requirements))
+            return self
+
+        if not requirements:
             return self
 
+        return self._register(bot, bot.processing_plugin)
+
+    async def _inject_when_ready(self, bot: LiteBot, plugin, requirements):
+        try:
+            fulfilled = await asyncio.wait_for(requirements, COG_REQUIREMENTS_TIMEOUT)
+        except asyncio.TimeoutError:
+            return bot.logger.warning(f"{self.__cog_name__} was not loaded, checking its requirements timed out!")
+        except Exception as e:
+            bot.logger.warning(f"{self.__cog_name__} was not loaded, checking its requirements failed!")
+            return bot.logger.exception(e, exc_info=e)
+
+        # The cog may have been unloaded while its requirements were being checked
+        if not fulfilled or bot.get_cog(self.__cog_name__) is not self:
+            return
+
+        try:
+            self._register(bot, plugin)
+        except Exception as e:
+            bot.logger.warning(f"{self.__cog_name__} was not loaded, registering it failed!")
+            return bot.logger.exception(e, exc_info=e)
+
+        if self.__mc_commands__:
+            await bot.servers.gather(lambda s: s.send_command_tree())
+
+    def _register(self, bot: LiteBot, plugin):
+        cls = self.__class__
+
         if not self.__cog_required__:
-            bot.settings_manager.add_settings(self, bot, bot.processing_plugin, self.__settings__)
+            bot.settings_manager.add_settings(self, bot, plugin, self.__settings__)
 
         for index, command in enumerate(self.__discord_commands__):
             command.cog = self
-            command.plugin = bot.processing_plugin
+            command.plugin = plugin
             if command.parent is None:
                 try:
                     setting = command.callback.__setting__
@@ -286,6 +328,10 @@ class Cog(DPYCog, metaclass=CogMeta):
     def _eject(self, bot: LiteBot):
         cls = self.__class__
 
+        if self._requirements_task is not None:
+            self._requirements_task.cancel()
+            self._requirements_task = None
+
         try:
             for command in self.__discord_commands__:
                 if command.parent is None:
@@ -1,5 +1,14 @@
 from .player import *
 from .server import *
+from .scheduler import *
+from .cache import *
+from .health import *
+from .poller import *
+from .tps_history import *
+from .dispatcher import *
+from .events import *
+from .batcher import *
+from .codec import *
 from .text import *
 from .rpc import *
 from .commands import *
\ No newline at end of file
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, Union
+
+# About one game tick
+DEFAULT_BATCH_WINDOW = 0.05
+NEWLINE_COMPONENT = json.dumps({"text": "\n"})
+
+
+@dataclass
+class MessageBatcherStats:
+    """
+    Counters describing how a `MessageBatcher` has been sending messages
+    """
+    messages: int = 0
+    merged: int = 0
+    frames: int = 0
+
+
+def merge_messages(first: Union[str, list[dict]], second: Union[str, list[dict]]) -> Union[str, list[dict]]:
+    """Merges two messages into one, on separate lines
+
+    Args:
+        first: The message that comes first, a built `Text` or its components
+        second: The message that comes second, in the same form as the first
+
+    Returns:
+        The merged message
+    """
+    if not first or first == "[]":
+        return second
+    if not second or second == "[]":
+        return first
+
+    if isinstance(first, list):
+        return [*first, {"text": "\n"}, *second]
+
+    return f"{first[:-1]}, {NEWLINE_COMPONENT}, {second[1:]}"
+
+
+class MessageBatcher:
+    """Collects the messages sent to a server over a short window, and sends them in a single frame
+
+    Consecutive messages for the same target, the same player or everyone, with the same `opOnly`,
+    are merged into one message. A window with more than one message is sent as a `messages` frame
+    with an array of the payloads, and a window with a single message as a plain `message` frame.
+
+    Sending a message only queues it, so a caller sending to several players in a loop has
+    all of them batched together. Anything else sent over the connection should call `flush` first,
+    so that it can't overtake the queued messages.
+
+    Args:
+        loop: The event loop to send on
+        send: Encodes and sends a frame over the server's connection
+        window: The number of seconds messages are collected for, 0 to send every message on its own
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, send: Callable[[dict], Awaitable[None]],
+                 window: float = DEFAULT_BATCH_WINDOW):
+        self.loop = loop
+        self.window = window
+        self.stats = MessageBatcherStats()
+
+        self._send = send
+        self._batch: list[dict] = []
+        self._flushed: Optional[asyncio.Future] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._sending: Optional[asyncio.Task] = None
+
+    async def send(self, payload: dict) -> Optional[asyncio.Future]:
+        """Queue a message to be sent
+
+        This returns as soon as the message is queued, without waiting for the window to end.
+        Without a window, the message is sent straight away instead.
+
+        Args:
+            payload: The message payload, as described in `MinecraftServer.send_message`
+
+        Returns:
+            A future that is done once the frame containing the message has been sent,
+            None if it was sent straight away
+        """
+        self.stats.messages += 1
+        if self.window <= 0:
+            await self.flush()
+            self.stats.frames += 1
+            return await self._send({"name": "message", "data": payload})
+
+        if self._flushed is None:
+            self._flushed = self.loop.create_future()
+            # Nobody has to wait on the frame, so a failure to send it shouldn't be reported as unretrieved
+            self._flushed.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._timer = self.loop.call_later(self.window, self._flush)
+
+        last = self._batch[-1] if self._batch else None
+        if last and last.get("player") == payload.get("player") and last.get("opOnly") == payload.get("opOnly"):
+            last["message"] = merge_messages(last["message"], payload["message"])
+            self.stats.merged += 1
+        else:
+            self._batch.append(dict(payload))
+
+        return self._flushed
+
+    async def flush(self) -> None:
+        """
+        Sends the queued messages now, and waits until every message queued so far has been sent
+        """
+        if self._flushed is not None:
+            self._timer.cancel()
+            self._flush()
+
+        if self._sending is not None:
+            await asyncio.wait((self._sending,))
+
+    def _flush(self) -> None:
+        batch, flushed = self._batch, self._flushed
+        self._batch, self._flushed, self._timer = [], None, None
+        self._sending = self.loop.create_task(self._send_batch(batch, flushed, self._sending))
+
+    async def _send_batch(self, batch: list[dict], flushed: asyncio.Future, previous: Optional[asyncio.Task]) -> None:
+        if previous is not None:
+            # Keep the frames in order, if the previous one is still being sent
+            await asyncio.wait((previous,))
+
+        if len(batch) == 1:
+            frame = {"name": "message", "data": batch[0]}
+        else:
+            frame = {"name": "messages", "data": batch}
+
+        try:
+            self.stats.frames += 1
+            await self._send(frame)
+        except Exception as e:
+            if not flushed.done():
+                flushed.set_exception(e)
+        else:
+            if not flushed.done():
+                flushed.set_result(None)
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+
+@dataclass
+class CommandCacheStats:
+    """
+    Counters describing how a `CommandCache` has been answering commands
+    """
+    hits: int = 0
+    misses: int = 0
+    shared: int = 0
+    invalidations: int = 0
+
+
+class CommandCache:
+    """A TTL cache with single-flight for read-only commands
+
+    Concurrent requests for the same command share a single in-flight call, and the response
+    is then served from the cache until its TTL runs out. Calling `invalidate` drops everything,
+    and responses for calls that were in flight during an invalidation are not stored,
+    since they may have been read before the change.
+
+    Args:
+        loop: The event loop to run the calls on
+    """
+    MAX_ENTRIES = 256
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.stats = CommandCacheStats()
+
+        self._entries: dict[str, tuple[float, Optional[str]]] = {}
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self._generation = 0
+
+    async def get(self, command: str, ttl: float, func: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        """Get the response for a command, calling `func` only if there's no fresh response already
+
+        Args:
+            command: The command, used as the cache key
+            ttl: The number of seconds the response stays valid for
+            func: A function returning the awaitable that actually sends the command
+
+        Returns:
+            The response to the command
+        """
+        entry = self._entries.get(command)
+        if entry is not None and entry[0] > self.loop.time():
+            self.stats.hits += 1
+            return entry[1]
+
+        task = self._in_flight.get(command)
+        if task is not None:
+            self.stats.shared += 1
+        else:
+            self.stats.misses += 1
+            task = self.loop.create_task(self._fetch(command, ttl, func, self._generation))
+            self._in_flight[command] = task
+
+        # A caller giving up should not cancel the call for everyone else waiting on it
+        return await asyncio.shield(task)
+
+    def invalidate(self) -> None:
+        """
+        Drop every cached response
+        """
+        self._generation += 1
+        self.stats.invalidations += 1
+        self._entries.clear()
+        self._in_flight.clear()
+
+    async def _fetch(self, command: str, ttl: float, func: Callable[[], Awaitable[Optional[str]]],
+                     generation: int) -> Optional[str]:
+        try:
+            resp = await func()
+        finally:
+            if self._in_flight.get(command) is asyncio.current_task():
+                del self._in_flight[command]
+
+        if generation == self._generation:
+            now = self.loop.time()
+            if len(self._entries) >= self.MAX_ENTRIES:
+                self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+            self._entries[command] = (now + ttl, resp)
+
+        return resp
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import json
+import zlib
+from typing import Any, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+CODEC_JSON = "json"
+CODEC_MSGPACK = "msgpack"
+COMPRESSION_DEFLATE = "deflate"
+DEFAULT_COMPRESSION_THRESHOLD = 1024
+# The largest a deflated frame may be once it is decompressed
+DEFAULT_MAX_FRAME_SIZE = 4 * 1024 * 1024
+
+# The first byte of every binary frame
+FRAME_RAW = 0
+FRAME_DEFLATE = 1
+
+
+class Codec:
+    """Encodes and decodes the frames sent over a LiteBot-Mod websocket connection
+
+    Text codecs send frames as text, and binary codecs as binary frames starting with `FRAME_RAW`.
+    With compression enabled, frames of at least `threshold` bytes are deflated and sent as
+    binary frames starting with `FRAME_DEFLATE` instead, whatever the codec.
+    Deflated frames are only accepted when compression was negotiated, and may not
+    decompress to more than `max_size` bytes.
+
+    Sanic doesn't negotiate the permessage-deflate extension for websockets,
+    so compression is applied per frame here, where small frames can skip it.
+
+    Args:
+        compression: The compression to use for large frames, None for no compression
+        threshold: The size in bytes from which frames are compressed
+        structured_text: Whether messages are sent as lists of text components, rather than as built JSON strings
+        max_size: The largest a received frame may be once it is decompressed, in bytes
+    """
+    name = ""
+    binary = False
+
+    def __init__(self, compression: Optional[str] = None, threshold: int = DEFAULT_COMPRESSION_THRESHOLD,
+                 structured_text: bool = False, max_size: int = DEFAULT_MAX_FRAME_SIZE):
+        self.compression = compression
+        self.threshold = threshold
+        self.structured_text = structured_text
+        self.max_size = max_size
+
+    @classmethod
+    def available(cls) -> bool:
+        """
+        Returns:
+            Whether the codec's library is installed
+        """
+        return True
+
+    def dumps(self, obj: Any) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        raise NotImplementedError
+
+    def encode(self, frame: Any) -> Union[str, bytes]:
+        """Encode a frame to be sent
+
+        Args:
+            frame: The frame to encode
+
+        Returns:
+            The encoded frame, a string for text frames and bytes for binary frames
+        """
+        data = self.dumps(frame)
+        if self.compression == COMPRESSION_DEFLATE and len(data) >= self.threshold:
+            deflate = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+            return bytes((FRAME_DEFLATE,)) + deflate.compress(data) + deflate.flush()
+
+        if self.binary:
+            return bytes((FRAME_RAW,)) + data
+
+        return data.decode("utf8")
+
+    def decode(self, message: Union[str, bytes]) -> Any:
+        """Decode a received frame
+
+        Args:
+            message: The frame, as received from the websocket
+
+        Returns:
+            The decoded frame
+
+        Raises:
+            ValueError
+            zlib.error
+        """
+        if isinstance(message, str):
+            return self.loads(message)
+
+        if not message or message[0] not in (FRAME_RAW, FRAME_DEFLATE):
+            raise ValueError("Invalid binary frame")
+
+        data = message[1:]
+        if message[0] == FRAME_DEFLATE:
+            if self.compression != COMPRESSION_DEFLATE:
+                raise ValueError("Compression was not negotiated")
+
+            inflate = zlib.decompressobj(wbits=-zlib.MAX_WBITS)
+            data = inflate.decompress(data, self.max_size)
+            if inflate.unconsumed_tail:
+                raise ValueError("Decompressed frame is too large")
+
+        return self.loads(data)
+
+    def describe(self) -> dict:
+        """
+        Returns:
+            The negotiated settings, as sent to the server
+        """
+        return {"codec": self.name, "compression": self.compression, "structured_text": self.structured_text}
+
+
+class JsonCodec(Codec):
+    """
+    JSON, using orjson when it is installed and the standard library otherwise
+    """
+    name = CODEC_JSON
+
+    def dumps(self, obj: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(obj)
+
+        return json.dumps(obj, separators=(",", ":")).encode("utf8")
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        if orjson is not None:
+            return orjson.loads(data)
+
+        return json.loads(data)
+
+
+class MsgpackCodec(Codec):
+    """
+    MessagePack in binary frames, only available when msgpack is installed
+    """
+    name = CODEC_MSGPACK
+    binary = True
+
+    @classmethod
+    def available(cls) -> bool:
+        return msgpack is not None
+
+    def dumps(self, obj: Any) -> bytes:
+        return msgpack.packb(obj, use_bin_type=True)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        if isinstance(data, str):
+            raise ValueError("MessagePack frames must be binary")
+
+        return msgpack.unpackb(data, raw=False)
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec, MsgpackCodec)}
+
+
+def negotiate_codec(codecs: Optional[list[str]] = None, compression: Optional[list[str]] = None,
+                    threshold: int = DEFAULT_COMPRESSION_THRESHOLD, max_size: int = DEFAULT_MAX_FRAME_SIZE) -> Codec:
+    """Picks the codec for a connection from what the server offered when connecting
+
+    Servers that don't offer anything are sent JSON, with messages as built strings like before.
+    Otherwise the first codec the server offered that is available is used, falling back to JSON.
+
+    Args:
+        codecs: The names of the codecs the server supports, in order of preference
+        compression: The compression methods the server supports
+        threshold: The size in bytes from which frames are compressed
+        max_size: The largest a received frame may be once it is decompressed, in bytes
+
+    Returns:
+        The codec to use for the connection
+    """
+    if codecs is None:
+        return JsonCodec()
+
+    codec = next((CODECS[c] for c in codecs if c in CODECS and CODECS[c].available()), JsonCodec)
+    return codec(compression=COMPRESSION_DEFLATE if COMPRESSION_DEFLATE in (compression or []) else None,
+                 threshold=threshold, structured_text=True, max_size=max_size)
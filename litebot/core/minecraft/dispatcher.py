@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from .commands.payload import ServerStartPayload, ServerStopPayload, HostConnectPayload
+
+# Events that change the state of the whole server, these are kept in order with each other
+STATEFUL_EVENTS = frozenset({ServerStartPayload.EVENT_NAME, ServerStopPayload.EVENT_NAME, HostConnectPayload.EVENT_NAME})
+SERVER_KEY = "server"
+
+
+@dataclass
+class FrameDispatcherStats:
+    """
+    Counters describing how a `FrameDispatcher` has been handling frames
+    """
+    queued: int = 0
+    running: int = 0
+    peak_queued: int = 0
+    dispatched: int = 0
+
+
+def frame_key(action: str, data: dict) -> Optional[Hashable]:
+    """Decides which frames from a server have to be handled in order
+
+    Commands and events from the same player are handled in the order they were sent,
+    as are events of the same type without a player, and stateful server events with each other.
+    RPC calls are answered by their id, so they don't have to be ordered at all.
+
+    Args:
+        action: The action of the frame
+        data: The data of the frame
+
+    Returns:
+        The ordering key of the frame, or None if it can be handled in any order
+    """
+    if action not in ("command", "event"):
+        return None
+
+    if player := data.get("player"):
+        try:
+            player = json.loads(player)
+            return "player", player.get("uuid") or player.get("name")
+        except (json.JSONDecodeError, AttributeError):
+            pass
+
+    name = data.get("name")
+    return SERVER_KEY if name in STATEFUL_EVENTS else ("event", name)
+
+
+class FrameDispatcher:
+    """Handles the frames from a server's websocket concurrently
+
+    Frames that share an ordering key run one after another in the order they were submitted,
+    everything else runs concurrently, up to `max_concurrency` frames at once.
+    A slow frame then only holds up the frames that have to come after it.
+
+    Args:
+        loop: The event loop to handle frames on
+        max_concurrency: The maximum number of frames being handled at once
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_concurrency: int = 8):
+        self.loop = loop
+        self.max_concurrency = max(1, max_concurrency)
+        self.stats = FrameDispatcherStats()
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._tails: dict[Hashable, asyncio.Task] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._waiting: set[asyncio.Task] = set()
+
+    def submit(self, key: Optional[Hashable], func: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Queue a frame to be handled
+
+        Args:
+            key: The ordering key of the frame, see `frame_key`
+            func: A function returning the awaitable that handles the frame
+
+        Returns:
+            The task handling the frame
+        """
+        previous = self._tails.get(key) if key is not None else None
+        task = self.loop.create_task(self._run(previous, func))
+        self._tasks.add(task)
+        self._waiting.add(task)
+        task.add_done_callback(self._finished)
+
+        if key is not None:
+            self._tails[key] = task
+            task.add_done_callback(lambda t: self._tails.pop(key) if self._tails.get(key) is t else None)
+
+        self.stats.queued = len(self._waiting)
+        self.stats.peak_queued = max(self.stats.peak_queued, self.stats.queued)
+        return task
+
+    def cancel(self) -> None:
+        """
+        Cancels every frame that is queued or running, for when the connection is gone
+        """
+        for task in list(self._tasks):
+            task.cancel()
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        # Frames that were cancelled before they got to run never left the queue
+        self._waiting.discard(task)
+        self.stats.queued = len(self._waiting)
+
+    async def _run(self, previous: Optional[asyncio.Task], func: Callable[[], Awaitable[Any]]) -> Any:
+        if previous is not None:
+            # Only the order matters, a failed frame doesn't stop the ones after it
+            await asyncio.wait((previous,))
+
+        async with self._semaphore:
+            self._waiting.discard(asyncio.current_task())
+            self.stats.queued = len(self._waiting)
+            self.stats.running += 1
+            try:
+                return await func()
+            finally:
+                self.stats.running -= 1
+                self.stats.dispatched += 1
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from .commands.payload import TickPayload
+from .dispatcher import frame_key
+
+
+class EventPolicy(Enum):
+    """
+    What happens to an event when a server's event queue can't keep up
+    """
+    # Wait for room in the queue, which stops reading from the server until there is
+    BLOCK = "block"
+    # Drop the oldest queued event of the same type to make room
+    DROP_OLDEST = "drop_oldest"
+    # Replace the queued event of the same type, for the same player, with the new one
+    COALESCE_LATEST = "coalesce_latest"
+    # Only dispatch one out of every N events of the type
+    SAMPLE = "sample"
+
+
+DEFAULT_EVENT_POLICIES = {
+    TickPayload.EVENT_NAME: "coalesce_latest"
+}
+
+
+def parse_event_policy(value: str) -> tuple[EventPolicy, int]:
+    """Parses an event policy from the config
+
+    Args:
+        value: The name of the policy, sampling is written as `sample:N`
+
+    Returns:
+        The policy, and how many events are sampled over
+
+    Raises:
+        ValueError
+    """
+    name, _, every = value.partition(":")
+    policy = EventPolicy(name.lower())
+
+    if policy is EventPolicy.SAMPLE:
+        if not every.isdigit() or int(every) < 1:
+            raise ValueError(f"Invalid sample rate in event policy {value}, try something like sample:10")
+        return policy, int(every)
+
+    return policy, 1
+
+
+@dataclass
+class EventQueueStats:
+    """
+    Counters describing how an `EventQueue` has been handling events
+    """
+    queued: int = 0
+    peak_queued: int = 0
+    dispatched: int = 0
+    dropped: int = 0
+    coalesced: int = 0
+    sampled: int = 0
+
+
+@dataclass(eq=False)
+class _QueuedEvent:
+    name: str
+    key: Hashable
+    data: dict
+    action: str = "event"
+    reply: Optional[Callable[[Any], Awaitable[None]]] = None
+    done: Optional[Callable[[asyncio.Task], None]] = None
+
+
+class EventQueue:
+    """A bounded queue of events from a single server, drained in order into the server's dispatcher
+
+    Events that arrive while the queue is full are handled according to the policy for their type,
+    see `EventPolicy`. Policies that don't apply to a full queue still apply while it has room,
+    so coalesced events are merged and sampled events skipped as soon as they arrive.
+
+    Events are handed to the handler in the order they were queued, without waiting for them
+    to finish, so a slow event only holds up the events the handler orders after it.
+    At most `max_in_flight` handed off events can be unfinished at once, after which the
+    queue fills up and the overload policies apply.
+
+    Commands from the server are queued as well, so that they can't overtake the events sent before them.
+    They always wait for room in the queue, policies only apply to events.
+
+    Args:
+        loop: The event loop to drain the queue on
+        handler: Called with the action, data, reply and done callback of every frame that is dispatched,
+            returns the task dispatching it, which has to handle its own errors
+        size: The maximum number of events waiting to be dispatched
+        max_in_flight: The maximum number of dispatched events that haven't finished yet
+        policies: The policy for each event name, events without one use `EventPolicy.BLOCK`
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, handler: Callable[..., asyncio.Task], *,
+                 size: int = 1024, max_in_flight: int = 256, policies: Optional[dict[str, str]] = None):
+        self.loop = loop
+        self.handler = handler
+        self.size = max(1, size)
+        self.max_in_flight = max(1, max_in_flight)
+        self.policies = {name: parse_event_policy(p) for name, p in {**DEFAULT_EVENT_POLICIES, **(policies or {})}.items()}
+        self.stats = EventQueueStats()
+
+        self._queue: deque[_QueuedEvent] = deque()
+        self._coalescing: dict[tuple[str, Hashable], _QueuedEvent] = {}
+        self._seen: dict[str, int] = {}
+        self._lock = asyncio.Lock()
+        self._not_empty = asyncio.Condition(self._lock)
+        self._not_full = asyncio.Condition(self._lock)
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        self._active = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def put(self, data: dict, *, action: str = "event", reply: Optional[Callable[[Any], Awaitable[None]]] = None,
+                  done: Optional[Callable[[asyncio.Task], None]] = None) -> None:
+        """Queue an event, or another frame that has to stay in order with the events
+
+        This only waits if the queue is full, and the event's policy is to block.
+
+        Args:
+            data: The data for the event, as sent by the server
+            action: The action of the frame
+            reply: Called with the result of the frame, if there is one
+            done: Called with the task dispatching the frame once it is done
+        """
+        if self._task is None:
+            self._task = self.loop.create_task(self._work())
+
+        name = data.get("name")
+        if action == "event":
+            policy, every = self.policies.get(name, (EventPolicy.BLOCK, 1))
+        else:
+            policy, every = EventPolicy.BLOCK, 1
+
+        if policy is EventPolicy.SAMPLE:
+            seen = self._seen[name] = self._seen.get(name, 0) + 1
+            if (seen - 1) % every:
+                self.stats.sampled += 1
+                return
+
+        key = (action, name, frame_key(action, data))
+        async with self._lock:
+            while True:
+                if policy is EventPolicy.COALESCE_LATEST and (queued := self._coalescing.get(key)):
+                    queued.data = data
+                    self.stats.coalesced += 1
+                    return
+
+                if len(self._queue) < self.size:
+                    break
+
+                if policy is EventPolicy.DROP_OLDEST and (oldest := next(
+                        (e for e in self._queue if e.action == action and e.name == name), None)):
+                    self._queue.remove(oldest)
+                    self.stats.dropped += 1
+                    break
+
+                await self._not_full.wait()
+
+            event = _QueuedEvent(name, key, data, action, reply, done)
+            self._queue.append(event)
+            self._idle.clear()
+            if policy is EventPolicy.COALESCE_LATEST:
+                self._coalescing[key] = event
+
+            self.stats.queued = len(self._queue)
+            self.stats.peak_queued = max(self.stats.peak_queued, self.stats.queued)
+            self._not_empty.notify()
+
+    async def join(self) -> None:
+        """
+        Waits until every queued event has been dispatched, and has finished
+        """
+        await self._idle.wait()
+
+    def close(self) -> None:
+        """
+        Stops draining the queue, events that are still queued are dropped.
+        Events that were already dispatched are left to finish
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        self.stats.dropped += len(self._queue)
+        self._queue.clear()
+        self._coalescing.clear()
+        self.stats.queued = 0
+        self._idle.set()
+
+    async def _work(self) -> None:
+        while True:
+            await self._in_flight.acquire()
+            try:
+                async with self._lock:
+                    while not self._queue:
+                        await self._not_empty.wait()
+
+                    event = self._queue.popleft()
+                    if self._coalescing.get(event.key) is event:
+                        del self._coalescing[event.key]
+
+                    self.stats.queued = len(self._queue)
+                    self._not_full.notify()
+            except asyncio.CancelledError:
+                self._in_flight.release()
+                raise
+
+            self._active += 1
+            self.stats.dispatched += 1
+            self.handler(event.action, event.data, event.reply, event.done).add_done_callback(self._finished)
+
+    def _finished(self, _: asyncio.Task) -> None:
+        self._in_flight.release()
+        self._active -= 1
+        if not self._queue and not self._active:
+            self._idle.set()
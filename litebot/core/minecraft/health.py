@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+from enum import Enum
+from typing import Awaitable, Callable, Optional
+
+
+class ServerState(Enum):
+    UP = "up"
+    DEGRADED = "degraded"
+    DOWN = "down"
+    PROBING = "probing"
+
+
+class ServerHealth:
+    """Tracks whether a server is reachable, and acts as a circuit breaker for it
+
+    A failure moves an `UP` server to `DEGRADED`, and `failure_threshold` failures in a row
+    move it to `DOWN`. While a server is `DOWN` or `PROBING`, `available` is False so
+    callers can fail fast instead of waiting on connections that will time out.
+    Meanwhile `probe` is run in the background with exponential backoff, and the server is
+    `UP` again as soon as a probe, or any other call, succeeds.
+
+    Args:
+        loop: The event loop to run the probes on
+        probe: A function returning an awaitable that checks if the server is reachable
+        on_change: Called with the old and new state whenever the state changes
+        failure_threshold: The number of failures in a row before the server is considered down
+        backoff: The delay before the first probe, in seconds
+        max_backoff: The maximum delay between probes, in seconds
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, probe: Callable[[], Awaitable[bool]],
+                 on_change: Callable[[ServerState, ServerState], None], *,
+                 failure_threshold: int = 3, backoff: float = 1.0, max_backoff: float = 60.0):
+        self.loop = loop
+        self.state = ServerState.UP
+        self.failure_threshold = max(1, failure_threshold)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self._probe = probe
+        self._on_change = on_change
+        self._failures = 0
+        self._next_backoff = backoff
+        self._probe_handle: Optional[asyncio.TimerHandle] = None
+        self._probe_task: Optional[asyncio.Task] = None
+
+    @property
+    def available(self) -> bool:
+        """
+        Returns:
+            Whether calls to the server should be attempted at all
+        """
+        return self.state in (ServerState.UP, ServerState.DEGRADED)
+
+    def record_success(self) -> None:
+        """
+        Record a successful call to the server
+        """
+        self._failures = 0
+        self._next_backoff = self.backoff
+
+        if self._probe_handle is not None:
+            self._probe_handle.cancel()
+            self._probe_handle = None
+
+        self._set_state(ServerState.UP)
+
+    def close(self) -> None:
+        """
+        Stops probing the server
+        """
+        if self._probe_handle is not None:
+            self._probe_handle.cancel()
+            self._probe_handle = None
+
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            self._probe_task = None
+
+    def record_failure(self) -> None:
+        """
+        Record a failed call to the server
+        """
+        if not self.available:
+            return
+
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            self._set_state(ServerState.DOWN)
+            self._schedule_probe()
+        else:
+            self._set_state(ServerState.DEGRADED)
+
+    def _set_state(self, state: ServerState) -> None:
+        if state is self.state:
+            return
+
+        old, self.state = self.state, state
+        self._on_change(old, state)
+
+    def _schedule_probe(self) -> None:
+        self._probe_handle = self.loop.call_later(self._next_backoff, self._start_probe)
+        self._next_backoff = min(self._next_backoff * 2, self.max_backoff)
+
+    def _start_probe(self) -> None:
+        self._probe_handle = None
+        # The task is kept so that it isn't collected while it runs, and can be cancelled
+        self._probe_task = self.loop.create_task(self._run_probe())
+        self._probe_task.add_done_callback(
+            lambda t: setattr(self, "_probe_task", None) if self._probe_task is t else None)
+
+    async def _run_probe(self) -> None:
+        if self.state is not ServerState.DOWN:
+            return
+
+        self._set_state(ServerState.PROBING)
+        try:
+            reachable = await self._probe()
+        except Exception:
+            reachable = False
+
+        if self.state is not ServerState.PROBING:
+            # A call succeeded while the probe was running
+            return
+
+        if reachable:
+            self.record_success()
+        else:
+            self._set_state(ServerState.DOWN)
+            self._schedule_probe()
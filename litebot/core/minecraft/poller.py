@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Optional, TYPE_CHECKING
+
+from litebot.errors import MinecraftServerException
+from .commands.payload import PlayerJoinPayload, PlayerLeavePayload
+from .protocol import QueryResponse
+from .scheduler import CommandPriority
+
+if TYPE_CHECKING:
+    from .server import MinecraftServer
+
+# How much the poll interval is scaled by after the roster changed, and at most while nobody is online
+ACTIVE_RATE = 0.5
+IDLE_RATE = 4.0
+
+
+@dataclass
+class StatusSnapshot:
+    """
+    The status of a server as of the last time it was polled
+    """
+    status: QueryResponse
+    tps: Optional[tuple[float, float]] = None
+    timestamp: float = field(default_factory=time.time)
+
+    @property
+    def age(self) -> float:
+        """
+        Returns:
+            The number of seconds since the snapshot was taken
+        """
+        return time.time() - self.timestamp
+
+
+class StatusPoller:
+    """Refreshes the status of servers in the background
+
+    Every polled server has its `snapshot` updated every `interval` seconds, give or take
+    `jitter` times the interval so that servers aren't all queried at the same moment.
+    The TPS is included for servers that have scarpet available.
+
+    For servers without LiteBot-Mod, player join and leave events can be synthesized by
+    comparing consecutive player lists. Those servers are polled faster right after
+    the list changes, and slower while nobody is online.
+
+    Args:
+        loop: The event loop to poll on
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._rosters: dict[str, set[str]] = {}
+        self._rates: dict[str, float] = {}
+
+    @property
+    def polling(self) -> list[str]:
+        """
+        Returns:
+            The names of the servers being polled
+        """
+        return list(self._tasks)
+
+    def start(self, server: MinecraftServer, interval: float, jitter: float = 0.1, roster_events: bool = False) -> None:
+        """Start polling a server
+
+        Args:
+            server: The server to poll
+            interval: The average number of seconds between polls
+            jitter: The fraction of the interval that each delay is randomly shifted by
+            roster_events: Whether to dispatch player join and leave events from the player list
+        """
+        self.stop(server)
+        self._tasks[server.name] = self.loop.create_task(self._run(server, interval, jitter, roster_events))
+
+    def stop(self, server: Optional[MinecraftServer] = None) -> None:
+        """Stop polling a server
+
+        Args:
+            server: The server to stop polling, or every server if not given
+        """
+        names = [server.name] if server else list(self._tasks)
+        for name in names:
+            task = self._tasks.pop(name, None)
+            if task:
+                task.cancel()
+
+            self._rosters.pop(name, None)
+            self._rates.pop(name, None)
+
+    async def refresh(self, server: MinecraftServer) -> StatusSnapshot:
+        """Takes a new snapshot of a server's status
+
+        Args:
+            server: The server to take the snapshot of
+
+        Returns:
+            The new snapshot, which is also stored as the server's `snapshot`
+        """
+        status = await server.status(fresh=True)
+        tps = None
+
+        if status.online:
+            try:
+                if (await server.capabilities()).scarpet:
+                    tps = await server.tps(priority=CommandPriority.BACKGROUND)
+            except MinecraftServerException:
+                pass
+
+        server.snapshot = StatusSnapshot(status, tps)
+        return server.snapshot
+
+    async def _dispatch_roster_changes(self, server: MinecraftServer, status: QueryResponse) -> None:
+        """
+        Dispatches join and leave events for the difference between the last player list and this one
+        """
+        if not status.online or len(status.players) != status.players.online:
+            # A lost datagram shouldn't look like everyone leaving, and a partial player sample can't be compared
+            return
+
+        roster = set(status.players)
+        previous = self._rosters.get(server.name)
+        self._rosters[server.name] = roster
+        rate = self._rates.get(server.name, 1.0)
+
+        if previous is None:
+            # The players that were online before the bot started didn't just join
+            return
+
+        joined, left = roster - previous, previous - roster
+        if joined or left:
+            self._rates[server.name] = ACTIVE_RATE
+        elif not roster:
+            self._rates[server.name] = min(rate * 2, IDLE_RATE)
+        else:
+            self._rates[server.name] = min(rate * 2, 1.0)
+
+        for event, names in ((PlayerLeavePayload.EVENT_NAME, left), (PlayerJoinPayload.EVENT_NAME, joined)):
+            for name in sorted(names):
+                await server.event_queue.put({"name": event, "player": _roster_player(name)})
+
+    def _next_delay(self, server: MinecraftServer, interval: float, jitter: float) -> float:
+        return max(0.0, interval * self._rates.get(server.name, 1.0) * (1 + random.uniform(-jitter, jitter)))
+
+    async def _run(self, server: MinecraftServer, interval: float, jitter: float, roster_events: bool) -> None:
+        # Spread out the first polls as well
+        await asyncio.sleep(random.uniform(0, interval * jitter))
+
+        while True:
+            try:
+                snapshot = await self.refresh(server)
+                if roster_events:
+                    await self._dispatch_roster_changes(server, snapshot.status)
+            except Exception as e:
+                server.bot_instance.logger.warning(f"Failed to poll the status of {server.name}: {e!r}")
+
+            await asyncio.sleep(self._next_delay(server, interval, jitter))
+
+
+def _roster_player(name: str) -> str:
+    """
+    The player data for a player only known by name, the query protocol doesn't include anything else
+    """
+    return json.dumps({"name": name, "uuid": "", "pos_x": 0, "pos_y": 0, "pos_z": 0, "dimension": "", "op_level": 0})
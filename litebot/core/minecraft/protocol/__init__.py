@@ -12,4 +12,6 @@ His code can be found here: https://github.com/Dinnerbone/mcstatus
 
 from .connection import *
 from .rcon import *
-from .query import *
\ No newline at end of file
+from .query import *
+from .query_client import *
+from .slp import *
\ No newline at end of file
@@ -21,19 +21,29 @@ class Connection:
     def __init__(self):
         self.sent = bytearray()
         self.received = bytearray()
+        self.offset = 0
 
     def read(self, length: int) -> bytes:
         """
-        Reads the recieved packet
+        Reads the recieved packet, only the bytes that are read are copied
         :param length: The amount of bytes to read
         :type length: int
         :return: The data from the recieved packet
         :rtype: bytes
         """
-        result = self.received[:length]
-        self.received = self.received[length:]
+        with memoryview(self.received) as view:
+            result = bytes(view[self.offset:self.offset + length])
+        self.offset += len(result)
         return result
 
+    def skip(self, length: int) -> None:
+        """
+        Skips over part of the recieved packet without copying it
+        :param length: The amount of bytes to skip
+        :type length: int
+        """
+        self.offset = min(self.offset + length, len(self.received))
+
     def write(self, data: Any) -> None:
         """
         Writes data to the outgoing packet
@@ -52,8 +62,6 @@ class Connection:
         :param data: The data in the form of a bytearray
         :type data: Any
         """
-        if not isinstance(data, bytearray):
-            data = bytearray(data)
         self.received.extend(data)
 
     def remaining(self) -> int:
@@ -62,7 +70,7 @@ class Connection:
         :return: Length of the remaining data
         :rtype: int
         """
-        return len(self.received)
+        return len(self.received) - self.offset
 
     def flush(self) -> str:
         """
@@ -71,7 +79,7 @@ class Connection:
         :rtype: str
         """
         result = self.sent
-        self.sent = ""
+        self.sent = bytearray()
         return result
 
     def _unpack(self, format_: str, data: Any) -> tuple:
@@ -100,14 +108,19 @@ class Connection:
 
     def read_ascii(self) -> str:
         """
-        Reads ascii from recieved data
+        Reads a null terminated string from recieved data
         :return: The data decored from bytes
         :rtype: str
+        :raises ValueError: If the string isn't terminated
         """
-        result = bytearray()
-        while len(result) == 0 or result[-1] != 0:
-            result.extend(self.read(1))
-        return result[:-1].decode("ISO-8859-1")
+        end = self.received.find(b"\x00", self.offset)
+        if end == -1:
+            raise ValueError("Unterminated string in packet")
+
+        with memoryview(self.received) as view:
+            result = str(view[self.offset:end], "ISO-8859-1")
+        self.offset = end + 1
+        return result
 
     def write_int(self, value: int) -> None:
         """
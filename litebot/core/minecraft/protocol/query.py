@@ -6,8 +6,8 @@ class QueryResponse:
     Models the response data from a query request response
     """
     class Players:
-        def __init__(self, names, max_=100):
-            self.online = len(names)
+        def __init__(self, names, max_=100, online=None):
+            self.online = len(names) if online is None else int(online)
             self.max = int(max_)
             self.names = names
 
@@ -22,15 +22,21 @@ class QueryResponse:
             return ", ".join(self.names)
 
     def __init__(self, **data):
+        # Only known when the status came from a server list ping
+        self.protocol = data.get("protocol")
+        self.latency = data.get("latency")
+
         if not data["status"]:
             self.online = data["status"]
             self.motd = None
+            self.version = None
             self.players = QueryResponse.Players([])
             return
 
         self.online = data["status"]
         self.motd = data["raw"]["hostname"]
-        self.players = QueryResponse.Players(data["players"], data["raw"]["maxplayers"])
+        self.version = data.get("version", data["raw"].get("version"))
+        self.players = QueryResponse.Players(data["players"], data["raw"]["maxplayers"], data.get("online"))
 
     def __repr__(self):
         return f"<QueryResponse status={self.online}, motd={self.motd}, players={self.players}>"
@@ -67,7 +73,7 @@ class ServerQuerier:
         """
         packet = Connection()
         packet.receive(self.connection.read(self.connection.remaining()))
-        packet.read(1 + 4)
+        packet.skip(1 + 4)
         return packet
 
     def handshake(self) -> None:
@@ -89,20 +95,30 @@ class ServerQuerier:
         request.write_uint(0)
         self.connection.write(request)
 
-        response = self._read_packet()
-        response.read(len("splitnum") + 1 + 1 + 1)
+        return self.parse_query(self._read_packet())
+
+    @staticmethod
+    def parse_query(response: Connection) -> QueryResponse:
+        """
+        Parses a full stat response, with the packet type and session id already read
+        :param response: The response from the server
+        :type response: Connection
+        :return: A QueryResponse object with the data from the query
+        :rtype: QueryResponse
+        """
+        response.skip(len("splitnum") + 1 + 1 + 1)
         data = {}
         players = []
 
         while True:
             key = response.read_ascii()
             if len(key) == 0:
-                response.read(1)
+                response.skip(1)
                 break
             value = response.read_ascii()
             data[key] = value
 
-        response.read(len("player_") + 1 + 1)
+        response.skip(len("player_") + 1 + 1)
 
         while True:
             name = response.read_ascii()
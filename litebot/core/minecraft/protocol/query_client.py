@@ -0,0 +1,206 @@
+import asyncio
+import itertools
+import socket
+import struct
+from dataclasses import dataclass
+from typing import Optional
+
+from .connection import Connection
+from .query import QueryResponse, ServerQuerier
+
+# The server forgets challenge tokens after about 30 seconds
+CHALLENGE_TTL = 25
+# How long to wait on a cached challenge before assuming the server silently rejected it
+STALE_CHALLENGE_TIMEOUT = 2
+
+
+@dataclass
+class QueryClientStats:
+    """
+    Counters describing how often a `QueryClient` could skip the handshake
+    """
+    hits: int = 0
+    misses: int = 0
+    stale: int = 0
+
+
+class QueryClient:
+    """
+    An asyncio client for the query protocol.
+    A single UDP socket is shared between the queries for every server,
+    and responses are routed back to the waiting query by their session id and packet type.
+    Challenge tokens are cached per server, so repeated queries only take a single round trip.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self.transport: Optional[asyncio.DatagramTransport] = None
+
+        self._session_ids = itertools.count(1)
+        self._sessions: set[int] = set()
+        self._pending: dict[int, tuple[tuple[str, int], int, asyncio.Future]] = {}
+        self._challenges: dict[tuple[str, int], tuple[float, int]] = {}
+        self._open_lock = asyncio.Lock()
+        self.stats = QueryClientStats()
+
+    async def query(self, addr: tuple[str, int], timeout: float = 3) -> QueryResponse:
+        """
+        Performs a full stat query on a server.
+        The handshake and the query share the deadline, and cancelling the call
+        stops waiting on the server straight away.
+
+        :param addr: The IP address and port of the server
+        :type addr: tuple[str, int]
+        :param timeout: The number of seconds the whole exchange may take
+        :type timeout: float
+        :return: The response from the server
+        :rtype: QueryResponse
+        :raises asyncio.TimeoutError: If the server did not respond in time
+        """
+        return await asyncio.wait_for(self._query(addr, min(STALE_CHALLENGE_TIMEOUT, timeout / 2)), timeout)
+
+    def close(self) -> None:
+        """
+        Closes the shared socket, failing every query in flight
+        """
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+    async def _query(self, addr: tuple[str, int], stale_timeout: float) -> QueryResponse:
+        session_ids = [self._next_session_id()]
+        self._sessions.add(session_ids[0])
+
+        try:
+            challenge = self._cached_challenge(addr)
+            if challenge is not None:
+                self.stats.hits += 1
+                try:
+                    response = await asyncio.wait_for(
+                        self._request(addr, session_ids[0], ServerQuerier.PACKET_TYPE_QUERY, challenge, padding=True),
+                        stale_timeout)
+                    return ServerQuerier.parse_query(response)
+                except asyncio.TimeoutError:
+                    # The server doesn't answer requests with an unknown token, so retry once with a new one.
+                    # The retry gets its own session id, and the old one stays reserved until the query
+                    # is over, so that a late answer to the first request can't be mistaken for the retry's
+                    self.stats.stale += 1
+                    self._challenges.pop(addr, None)
+                    session_ids.append(self._next_session_id())
+                    self._sessions.add(session_ids[-1])
+            else:
+                self.stats.misses += 1
+
+            session_id = session_ids[-1]
+            challenge = await self._request(addr, session_id, ServerQuerier.PACKET_TYPE_CHALLENGE, 0)
+            challenge = int(challenge.read_ascii())
+            self._challenges[addr] = (self.loop.time() + CHALLENGE_TTL, challenge)
+
+            response = await self._request(addr, session_id, ServerQuerier.PACKET_TYPE_QUERY, challenge, padding=True)
+        finally:
+            self._sessions.difference_update(session_ids)
+
+        return ServerQuerier.parse_query(response)
+
+    def _cached_challenge(self, addr: tuple[str, int]) -> Optional[int]:
+        entry = self._challenges.get(addr)
+        if entry is None:
+            return None
+
+        expires, challenge = entry
+        if expires <= self.loop.time():
+            del self._challenges[addr]
+            return None
+
+        return challenge
+
+    async def _request(self, addr: tuple[str, int], session_id: int, packet_type: int, challenge: int,
+                       padding: bool = False) -> Connection:
+        """
+        Sends a single request and waits for the response with the same session id and packet type
+        """
+        await self._open()
+
+        packet = Connection()
+        packet.write(ServerQuerier.MAGIC_PREFIX)
+        packet.write(struct.pack("!B", packet_type))
+        packet.write_uint(session_id)
+        packet.write_int(challenge)
+        if padding:
+            packet.write_uint(0)
+
+        future = self.loop.create_future()
+        self._pending[session_id] = (addr, packet_type, future)
+        try:
+            self.transport.sendto(bytes(packet.flush()), addr)
+            data = await future
+        finally:
+            del self._pending[session_id]
+
+        response = Connection()
+        response.receive(data)
+        response.skip(1 + 4)
+        return response
+
+    async def _open(self) -> None:
+        if self.transport is not None and not self.transport.is_closing():
+            return
+
+        async with self._open_lock:
+            if self.transport is None or self.transport.is_closing():
+                await self.loop.create_datagram_endpoint(lambda: _QueryProtocol(self), family=socket.AF_INET)
+
+    def _next_session_id(self) -> int:
+        """
+        Picks a session id that isn't in use.
+        The server masks the session id it echoes back with 0x0F0F0F0F, so only those bits are used.
+        """
+        while True:
+            n = next(self._session_ids) & 0xFFFF
+            session_id = (n & 0xF) | (n & 0xF0) << 4 | (n & 0xF00) << 8 | (n & 0xF000) << 12
+            if session_id and session_id not in self._sessions:
+                return session_id
+
+    def _handle_datagram(self, data: bytes, addr: tuple[str, int]) -> None:
+        if len(data) < 5:
+            return
+
+        (session_id,) = struct.unpack_from(">I", data, 1)
+        pending = self._pending.get(session_id)
+        if pending is None:
+            # The query already gave up on this response
+            return
+
+        expected, packet_type, future = pending
+        if addr[0] != expected[0] or data[0] != packet_type or future.done():
+            # Not from the server, or the answer to an earlier request of the same session
+            return
+
+        future.set_result(data)
+
+    def _fail_pending(self, exc: Exception) -> None:
+        for _, _, future in self._pending.values():
+            if not future.done():
+                future.set_exception(exc)
+
+
+class _QueryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, client: QueryClient) -> None:
+        self.client = client
+        self.transport: Optional[asyncio.DatagramTransport] = None
+
+    def connection_made(self, transport: asyncio.DatagramTransport) -> None:
+        self.transport = transport
+        self.client.transport = transport
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        self.client._handle_datagram(data, addr)
+
+    def error_received(self, exc: Exception) -> None:
+        # ICMP errors can't be tied back to a session, so let the queries time out instead
+        pass
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        if self.client.transport is self.transport:
+            self.client.transport = None
+        self.client._fail_pending(exc or ConnectionResetError("The query socket was closed"))
@@ -1,30 +1,84 @@
 import asyncio
-import random
-import socket, select, ssl, struct, time
+import itertools
+import socket, ssl, struct
+from dataclasses import dataclass
 from typing import Optional
 
 from litebot.errors import RconException
 
+# The vanilla server splits responses into packets with bodies of at most this many bytes
+MAX_FRAGMENT_SIZE = 4096
+# Anything larger than this can't be a sane RCON packet
+MAX_PACKET_SIZE = 1024 * 1024
+
+SERVERDATA_RESPONSE_VALUE = 0
+SERVERDATA_EXECCOMMAND = 2
+SERVERDATA_AUTH = 3
+
 class ServerRcon(object):
-    def __init__(self, loop: asyncio.AbstractEventLoop, host, password, port=25575, tlsmode=0):
+    """
+    A single RCON connection.
+
+    Any number of coroutines can wait on commands at once, every response packet is handed
+    to the caller whose request id it carries.
+
+    The vanilla server drops the connection if a single read returns more than one packet (MC-72390),
+    so by default a request is only written once the previous one has been answered.
+    Servers without that bug can set `pipeline_depth` to have that many requests written back to back.
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop, host, password, port=25575, tlsmode=0, pipeline_depth=1):
         self.loop = loop
         self.socket: Optional[socket.socket] = None
+        self.transport: Optional[asyncio.Transport] = None
         self.host = host
         self.password = password
         self.port = port
         self.tlsmode = tlsmode
+        self.commands_sent = 0
+        self.last_used = loop.time()
+
+        self._ids = itertools.count(1)
+        self._pending: dict[int, asyncio.Future] = {}
+        self._fragments: dict[int, list[str]] = {}
+        self._sentinels: dict[int, int] = {}
+        self._unterminated: set[int] = set()
+        self._window = asyncio.Semaphore(max(1, pipeline_depth))
+        # Requests waiting for room in the pipeline, they haven't been written yet
+        self._queued = 0
+
+    @property
+    def alive(self) -> bool:
+        """
+        Checks whether the connection can still be used.
+        :return: Whether the connection is still open
+        :rtype: bool
+        """
+        return self.transport is not None and not self.transport.is_closing()
+
+    @property
+    def in_flight(self) -> int:
+        """
+        :return: The number of requests still waiting for a response, including the ones not written yet
+        :rtype: int
+        """
+        return len(self._pending) + self._queued
 
     async def connect(self):
-        self._connect()
-        self.socket.setblocking(False)
+        ctx = self._ssl_context()
+        await self.loop.create_connection(
+            lambda: _RconProtocol(self), self.host, self.port,
+            ssl=ctx, server_hostname=self.host if ctx else None)
 
-        await self.loop.sock_connect(self.socket, (self.host, self.port))
-        await self._send(3, self.password)
+        await self._send(SERVERDATA_AUTH, self.password)
 
     def sync_connect(self):
-        self._connect()
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+        if ctx := self._ssl_context():
+            self.socket = ctx.wrap_socket(self.socket, server_hostname=self.host)
+
         self.socket.connect((self.host, self.port))
-        self._send_sync(3, self.password)
+        self._send_sync(SERVERDATA_AUTH, self.password)
 
     async def command(self, command) -> Optional[str]:
         """
@@ -42,76 +96,70 @@ class ServerRcon(object):
         :rtype: str
         """
 
-        result = await self._send(2, f"/{command}")
-        await asyncio.sleep(0.003)  # MC-72390 workaround
+        result = await self._send(SERVERDATA_EXECCOMMAND, f"/{command}")
+        self.commands_sent += 1
         return result
 
     def sync_command(self, command) -> Optional[str]:
-        result = self._send_sync(2, f"/{command}")
-        time.sleep(0.003)
-        return result
+        return self._send_sync(SERVERDATA_EXECCOMMAND, f"/{command}")
+
+    async def ping(self) -> None:
+        """
+        Makes a round trip to the server without running a command.
+        The server answers packets of an unknown type with an error message,
+        which only needs the RCON thread to be responsive.
+        """
+        await self._send(SERVERDATA_RESPONSE_VALUE, "")
 
     def disconnect(self) -> None:
         """
         Disconnects the socket server
         """
+        self._fail_pending(ConnectionResetError("RCON connection was closed"))
+
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
         if self.socket is not None:
             self.socket.close()
             self.socket = None
 
-    def _connect(self):
+    def _ssl_context(self) -> Optional[ssl.SSLContext]:
         """
-        Connects to the RCON server via socket
+        Creates the SSL context for the connection if TLS is enabled
         """
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if self.tlsmode <= 0:
+            return None
 
-        # Enable TLS
-        if self.tlsmode > 0:
-            ctx = ssl.create_default_context()
+        ctx = ssl.create_default_context()
 
-            # Disable hostname and certificate verification
-            if self.tlsmode > 1:
-                ctx.check_hostname = False
-                ctx.verify_mode = ssl.CERT_NONE
+        # Disable hostname and certificate verification
+        if self.tlsmode > 1:
+            ctx.check_hostname = False
+            ctx.verify_mode = ssl.CERT_NONE
 
-            self.socket = ctx.wrap_socket(self.socket, server_hostname=self.host)
-
-    async def _read(self, length: int) -> bytes:
-        """
-        Reads incoming data
-        :param length: The length of the data to read
-        :type length: int
-        :return: The data that has been recieved
-        :rtype: bytes
-        """
-        data = b""
-        while len(data) < length:
-            data += await self.loop.sock_recv(self.socket, length - len(data))
-
-        return data
+        return ctx
 
     def _read_sync(self, length: int):
-        data = b""
-        while len(data) < length:
-            data += self.socket.recv(length - len(data))
+        data = bytearray(length)
+        view = memoryview(data)
+        received = 0
+        while received < length:
+            chunk = self.socket.recv_into(view[received:])
+            if not chunk:
+                raise ConnectionResetError("RCON connection closed by the server")
+            received += chunk
 
         return data
 
-    def _get_payload(self, out_type, out_data):
-        if self.socket is None:
-            raise RconException("Must connect before sending data")
-
-        req_id = random.randint(0, 2147483647)
-        # Send a request packet
-        out_payload = (
-                struct.pack("<ii", req_id, out_type) + out_data.encode("utf8") + b"\x00\x00"
-        )
-        out_length = struct.pack("<i", len(out_payload))
-
-        return out_length, out_payload
+    @staticmethod
+    def _build_packet(req_id: int, out_type: int, out_data: str) -> bytes:
+        body = out_data.encode("utf8")
+        return struct.pack("<iii", len(body) + 10, req_id, out_type) + body + b"\x00\x00"
 
-    def _resolve_data(self, in_payload):
-        in_id, in_type = struct.unpack("<ii", in_payload[:8])
+    def _resolve_data(self, in_payload) -> tuple[int, str]:
+        in_id, in_type = struct.unpack_from("<ii", in_payload)
         in_data_partial, in_padding = in_payload[8:-2], in_payload[-2:]
 
         # Sanity checks
@@ -121,11 +169,11 @@ class ServerRcon(object):
             raise RconException("Login failed")
 
         # Record the response
-        return in_data_partial.decode("utf8")
+        return in_id, str(in_data_partial, "utf8")
 
     async def _send(self,  out_type: int, out_data: str) -> Optional[str]:
         """
-        Sends data to the server
+        Sends data to the server and waits for the response to it
         :param out_type: The out type of the data being sent
         :type out_type: int
         :param out_data: The data to send to the server
@@ -133,36 +181,357 @@ class ServerRcon(object):
         :return: The server's response, if any
         :rtype: str
         """
+        self._queued += 1
+        try:
+            await self._window.acquire()
+        finally:
+            self._queued -= 1
+
+        try:
+            if not self.alive:
+                raise ConnectionResetError("RCON connection is not open")
+
+            req_id = next(self._ids)
+            response = self.loop.create_future()
+            self._pending[req_id] = response
+            self._fragments[req_id] = []
+            self.last_used = self.loop.time()
+
+            try:
+                self.transport.write(self._build_packet(req_id, out_type, out_data))
+                return await response
+            finally:
+                self._pending.pop(req_id, None)
+                self._fragments.pop(req_id, None)
+                self.last_used = self.loop.time()
+        finally:
+            self._window.release()
+
+    def _handle_packet(self, in_id: int, in_length: int, body: memoryview) -> None:
+        """
+        Resolves the request that a response packet belongs to
+        """
+        if in_id == -1:
+            self._fail_pending(RconException("Login failed"))
+            self.transport.close()
+            return
+
+        if in_id in self._sentinels:
+            # The server answers requests in order, so the reply to the sentinel
+            # means that every fragment of the response before it has arrived
+            self._complete(self._sentinels.pop(in_id))
+            return
+
+        fragments = self._fragments.get(in_id)
+        if fragments is None:
+            # The caller has stopped waiting for this response
+            return
+
+        fragments.append(str(body, "utf8"))
+        if in_id in self._sentinels.values():
+            return
+
+        if in_length - 10 < MAX_FRAGMENT_SIZE:
+            # Only the last packet of a split response is shorter than the fragment size
+            self._unterminated.discard(in_id)
+            self._complete(in_id)
+        else:
+            self._unterminated.add(in_id)
+
+    def _send_sentinels(self) -> None:
+        """
+        Called once everything that has been received so far is handled. A response whose
+        last packet was full might be followed by more, so ask the server for a reply that
+        can only arrive after the last of them
+        """
+        for req_id in self._unterminated:
+            if req_id in self._pending:
+                sentinel_id = next(self._ids)
+                self._sentinels[sentinel_id] = req_id
+                self.transport.write(self._build_packet(sentinel_id, SERVERDATA_RESPONSE_VALUE, ""))
 
-        out_length, out_payload = self._get_payload(out_type, out_data)
-        await self.loop.sock_sendall(self.socket, out_length + out_payload)
-
-        # Read response packets
-        in_data = ""
-        while True:
-            # Read a packet
-            (in_length,) = struct.unpack("<i", await self._read(4))
-            in_payload = await self._read(in_length)
+        self._unterminated.clear()
 
-            in_data += self._resolve_data(in_payload)
+    def _complete(self, req_id: int) -> None:
+        response = self._pending.get(req_id)
+        if response is not None and not response.done():
+            response.set_result("".join(self._fragments.get(req_id, [])))
 
-            # If there's nothing more to receive, return the response
-            if len(select.select([self.socket], [], [], 0)[0]) == 0:
-                return in_data
+    def _fail_pending(self, exc: Exception) -> None:
+        for response in self._pending.values():
+            if not response.done():
+                response.set_exception(exc)
 
     def _send_sync(self, out_type, out_data):
-        out_length, out_payload = self._get_payload(out_type, out_data)
-        self.socket.send(out_length + out_payload)
+        if self.socket is None:
+            raise RconException("Must connect before sending data")
+
+        req_id = next(self._ids)
+        self.socket.sendall(self._build_packet(req_id, out_type, out_data))
 
         # Read response packets
         in_data = ""
+        sentinel_id = None
         while True:
             # Read a packet
             (in_length,) = struct.unpack("<i", self._read_sync(4))
-            in_payload = self._read_sync(in_length)
+            in_id, in_partial = self._resolve_data(self._read_sync(in_length))
+
+            if in_id == sentinel_id:
+                return in_data
 
-            in_data += self._resolve_data(in_payload)
+            in_data += in_partial
+            if sentinel_id is not None:
+                continue
 
-            # If there's nothing more to receive, return the response
-            if len(select.select([self.socket], [], [], 0)[0]) == 0:
+            if in_length - 10 < MAX_FRAGMENT_SIZE:
                 return in_data
+            else:
+                sentinel_id = next(self._ids)
+                self.socket.sendall(self._build_packet(sentinel_id, SERVERDATA_RESPONSE_VALUE, ""))
+
+
+class _RconProtocol(asyncio.BufferedProtocol):
+    """
+    Parses length prefixed RCON packets straight out of a single receive buffer.
+
+    The event loop writes incoming bytes directly into the buffer, and packets are handed
+    to the connection as views into it, so nothing is copied until the body is decoded.
+    """
+    INITIAL_BUFFER_SIZE = 64 * 1024
+    MIN_READ_SIZE = 16 * 1024
+
+    def __init__(self, rcon: ServerRcon):
+        self._rcon = rcon
+        self._buffer = bytearray(self.INITIAL_BUFFER_SIZE)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self._rcon.transport = transport
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        if len(self._buffer) - self._end < self.MIN_READ_SIZE:
+            self._make_room()
+
+        return self._view[self._end:]
+
+    def buffer_updated(self, nbytes: int) -> None:
+        self._end += nbytes
+
+        try:
+            self._parse()
+            self._rcon._send_sentinels()
+        except (RconException, UnicodeDecodeError) as e:
+            self._rcon._fail_pending(e)
+            self._rcon.transport.close()
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self._rcon._fail_pending(exc or ConnectionResetError("RCON connection closed by the server"))
+
+    def _parse(self) -> None:
+        while self._end - self._start >= 4:
+            (in_length,) = struct.unpack_from("<i", self._buffer, self._start)
+            if not 10 <= in_length <= MAX_PACKET_SIZE:
+                raise RconException("Invalid packet length")
+
+            packet_end = self._start + 4 + in_length
+            if packet_end > self._end:
+                break
+
+            in_id, _ = struct.unpack_from("<ii", self._buffer, self._start + 4)
+            if self._view[packet_end - 2:packet_end] != b"\x00\x00":
+                raise RconException("Incorrect padding")
+
+            self._rcon._handle_packet(in_id, in_length, self._view[self._start + 12:packet_end - 2])
+            self._start = packet_end
+
+        if self._start == self._end:
+            self._start = self._end = 0
+
+    def _make_room(self) -> None:
+        """
+        Moves the partially received packet to the front of the buffer, or
+        grows the buffer if the packet doesn't fit in it
+        """
+        pending = self._end - self._start
+
+        if pending + self.MIN_READ_SIZE <= len(self._buffer) // 2:
+            self._view[:pending] = self._view[self._start:self._end]
+        else:
+            buffer = bytearray(len(self._buffer) * 2)
+            buffer[:pending] = self._view[self._start:self._end]
+            self._buffer, self._view = buffer, memoryview(buffer)
+
+        self._start, self._end = 0, pending
+
+
+@dataclass
+class RconPoolStats:
+    """
+    Counters describing how a `RconConnectionPool` has been serving commands
+    """
+    created: int = 0
+    reused: int = 0
+    discarded: int = 0
+    reaped: int = 0
+
+
+class RconConnectionPool:
+    """
+    Keeps a set of authenticated RCON connections to a single server so that
+    commands don't have to pay for a TCP handshake and a login round trip every time.
+
+    Commands are pipelined onto the least busy connection, and a new connection is only
+    opened while all of the existing ones are busy and there are fewer than `size` of them.
+    Connections that have not been used for `idle_timeout` seconds are closed, and connections
+    that turn out to be dead are discarded and replaced transparently.
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop, host, password, port=25575, tlsmode=0,
+                 *, size: int = 2, idle_timeout: float = 300.0, pipeline_depth: int = 1,
+                 connect_timeout: float = 5.0):
+        self.loop = loop
+        self.host = host
+        self.password = password
+        self.port = port
+        self.tlsmode = tlsmode
+        self.pipeline_depth = pipeline_depth
+        self.size = max(1, size)
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.stats = RconPoolStats()
+
+        self._connections: list[ServerRcon] = []
+        self._connect_lock = asyncio.Lock()
+        self._reaper: Optional[asyncio.TimerHandle] = None
+
+    async def command(self, command: str) -> Optional[str]:
+        """
+        Executes a command on a pooled connection.
+        If a reused connection turns out to be broken, the command is retried once on a new connection.
+
+        :param command: The command to send to the server
+        :type command: str
+        :return: The server's response
+        :rtype: str
+        """
+        rcon = await self._acquire()
+        reused = rcon.commands_sent > 0
+
+        try:
+            result = await rcon.command(command)
+        except OSError:
+            self._discard(rcon)
+            if not reused:
+                raise
+
+            rcon = await self._acquire()
+            result = await rcon.command(command)
+
+        self._schedule_reap()
+        return result
+
+    async def ping(self) -> bool:
+        """
+        Checks that the server answers on an authenticated connection within `connect_timeout`.
+        A connection that doesn't answer in time is discarded.
+
+        :return: Whether the server is reachable
+        :rtype: bool
+        """
+        rcon = await self._acquire()
+
+        try:
+            await asyncio.wait_for(rcon.ping(), self.connect_timeout)
+        except (OSError, asyncio.TimeoutError):
+            self._discard(rcon)
+            raise
+
+        self._schedule_reap()
+        return True
+
+    def sync_command(self, command: str) -> Optional[str]:
+        """
+        Executes a command on a one-off blocking connection that does not go through the pool.
+
+        :param command: The command to send to the server
+        :type command: str
+        :return: The server's response
+        :rtype: str
+        """
+        rcon = ServerRcon(self.loop, self.host, self.password, self.port, self.tlsmode)
+        try:
+            rcon.sync_connect()
+            return rcon.sync_command(command)
+        finally:
+            rcon.disconnect()
+
+    def close(self) -> None:
+        """
+        Closes all the connections in the pool
+        """
+        for rcon in self._connections:
+            rcon.disconnect()
+        self._connections.clear()
+
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+
+    async def _acquire(self) -> ServerRcon:
+        """
+        Picks the least busy live connection, opening a new one if every connection is busy and the pool isn't full
+        """
+        for rcon in [c for c in self._connections if not c.alive]:
+            self._discard(rcon)
+
+        rcon = min(self._connections, key=lambda c: c.in_flight, default=None)
+        if rcon is not None and (rcon.in_flight == 0 or len(self._connections) >= self.size):
+            self.stats.reused += 1
+            return rcon
+
+        async with self._connect_lock:
+            # Another caller may have opened a connection while we were waiting
+            rcon = min([c for c in self._connections if c.alive], key=lambda c: c.in_flight, default=None)
+            if rcon is not None and (rcon.in_flight == 0 or len(self._connections) >= self.size):
+                self.stats.reused += 1
+                return rcon
+
+            rcon = ServerRcon(self.loop, self.host, self.password, self.port, self.tlsmode, self.pipeline_depth)
+            try:
+                await asyncio.wait_for(rcon.connect(), self.connect_timeout)
+            except BaseException:
+                rcon.disconnect()
+                raise
+
+            self._connections.append(rcon)
+            self.stats.created += 1
+            return rcon
+
+    def _discard(self, rcon: ServerRcon) -> None:
+        if rcon in self._connections:
+            self._connections.remove(rcon)
+            self.stats.discarded += 1
+
+        rcon.disconnect()
+
+    def _schedule_reap(self) -> None:
+        if self._reaper is None and self._connections:
+            self._reaper = self.loop.call_later(self.idle_timeout, self._reap)
+
+    def _reap(self) -> None:
+        """
+        Closes the connections which have been idle for longer than `idle_timeout`
+        """
+        self._reaper = None
+        deadline = self.loop.time() - self.idle_timeout
+
+        for rcon in [c for c in self._connections if c.in_flight == 0 and c.last_used <= deadline]:
+            self._connections.remove(rcon)
+            rcon.disconnect()
+            self.stats.reaped += 1
+
+        if self._connections:
+            next_expiry = min(c.last_used for c in self._connections) - deadline
+            self._reaper = self.loop.call_later(max(next_expiry, 1.0), self._reap)
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import struct
+from typing import Any, Union
+
+from .query import QueryResponse
+
+# Any protocol version is accepted for a status request, -1 is the convention for "unknown"
+SLP_PROTOCOL_VERSION = -1
+SLP_STATE_STATUS = 1
+SLP_PACKET_STATUS = 0x00
+MAX_SLP_RESPONSE_SIZE = 1 << 21
+
+
+def write_varint(value: int) -> bytes:
+    """
+    Encodes an integer as a VarInt
+    :param value: The integer to encode, between -2^31 and 2^31 - 1
+    :type value: int
+    :return: The encoded integer
+    :rtype: bytes
+    """
+    value &= 0xFFFFFFFF
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+async def read_varint(reader: asyncio.StreamReader) -> int:
+    """
+    Reads a VarInt from a stream
+    :param reader: The stream to read from
+    :type reader: asyncio.StreamReader
+    :return: The decoded integer
+    :rtype: int
+    :raises ValueError: If the VarInt is longer than 5 bytes
+    """
+    value = 0
+    for i in range(5):
+        (byte,) = await reader.readexactly(1)
+        value |= (byte & 0x7F) << (7 * i)
+        if not byte & 0x80:
+            return value - (1 << 32) if value & (1 << 31) else value
+
+    raise ValueError("VarInt is too big")
+
+
+def _packet(packet_id: int, data: bytes = b"") -> bytes:
+    body = write_varint(packet_id) + data
+    return write_varint(len(body)) + body
+
+
+def _motd_text(description: Union[str, dict, list, None]) -> str:
+    """
+    Flattens a chat component into its plain text
+    """
+    if description is None:
+        return ""
+    if isinstance(description, str):
+        return description
+    if isinstance(description, list):
+        return "".join(_motd_text(d) for d in description)
+
+    return description.get("text", "") + "".join(_motd_text(e) for e in description.get("extra", []))
+
+
+class ServerListPing:
+    """
+    An asyncio client for the Server List Ping protocol, the one the multiplayer menu uses.
+    Unlike the query protocol it does not need to be enabled on the server,
+    and the whole status is returned in a single exchange over TCP.
+    The player list is only the sample that the server chooses to send.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+
+    async def status(self, addr: tuple[str, int], timeout: float = 3) -> QueryResponse:
+        """
+        Requests the status of a server
+        :param addr: The IP address and port of the server
+        :type addr: tuple[str, int]
+        :param timeout: The number of seconds the whole exchange may take
+        :type timeout: float
+        :return: The response from the server, with `latency` set to the round trip time in milliseconds
+        :rtype: QueryResponse
+        :raises asyncio.TimeoutError: If the server did not respond in time
+        :raises OSError: If the server could not be connected to
+        :raises ValueError: If the response is malformed
+        """
+        return await asyncio.wait_for(self._status(addr), timeout)
+
+    async def _status(self, addr: tuple[str, int]) -> QueryResponse:
+        reader, writer = await asyncio.open_connection(*addr)
+        try:
+            host, port = addr
+            handshake = write_varint(SLP_PROTOCOL_VERSION) + write_varint(len(host.encode("utf8"))) + \
+                host.encode("utf8") + struct.pack(">H", port) + write_varint(SLP_STATE_STATUS)
+
+            start = self.loop.time()
+            writer.write(_packet(0x00, handshake) + _packet(SLP_PACKET_STATUS))
+            await writer.drain()
+
+            length = await read_varint(reader)
+            if not 0 < length <= MAX_SLP_RESPONSE_SIZE:
+                raise ValueError(f"Invalid status response length {length}")
+
+            body = await reader.readexactly(length)
+            latency = (self.loop.time() - start) * 1000
+        finally:
+            writer.close()
+
+        return self.parse_status(body, latency)
+
+    @staticmethod
+    def parse_status(body: bytes, latency: float) -> QueryResponse:
+        """
+        Parses a status response packet
+        :param body: The packet, without its length
+        :type body: bytes
+        :param latency: The round trip time to the server in milliseconds
+        :type latency: float
+        :return: The status of the server
+        :rtype: QueryResponse
+        """
+        if body[0] != SLP_PACKET_STATUS:
+            raise ValueError(f"Unexpected packet {body[0]} in status response")
+
+        # The JSON string is prefixed with its length, which the packet length already covers
+        offset = 1
+        while body[offset] & 0x80:
+            offset += 1
+        data: dict[str, Any] = json.loads(body[offset + 1:].decode("utf8"))
+
+        players = data.get("players", {})
+        version = data.get("version", {})
+        return QueryResponse(
+            status=True,
+            raw={"hostname": _motd_text(data.get("description")), "maxplayers": players.get("max", 0),
+                 "numplayers": players.get("online", 0)},
+            players=[p["name"] for p in players.get("sample") or [] if "name" in p],
+            online=players.get("online", 0),
+            version=version.get("name"),
+            protocol=version.get("protocol"),
+            latency=latency
+        )
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class CommandPriority(IntEnum):
+    """
+    The priority classes for commands sent to a server, lower values are dispatched first
+    """
+    INTERACTIVE = 0
+    NORMAL = 1
+    BACKGROUND = 2
+
+
+DEFAULT_PRIORITY_LIMITS = {
+    CommandPriority.INTERACTIVE: 4,
+    CommandPriority.NORMAL: 2,
+    CommandPriority.BACKGROUND: 1
+}
+
+
+@dataclass(eq=False)
+class _Ticket:
+    priority: CommandPriority
+    enqueued: float
+    ready: asyncio.Future = field(repr=False)
+
+
+class CommandScheduler:
+    """Decides when commands to a single server get to run
+
+    Waiting commands are dispatched in priority order, FIFO within a priority class.
+    Every class has its own concurrency cap, so background work can never take up all of the
+    slots that interactive commands need. A command that has been waiting for `aging` seconds
+    is treated as one class more important, so lower classes are never starved.
+    An optional `rate` caps the number of commands per second sent to the server.
+
+    Args:
+        loop: The event loop the scheduler runs on
+        max_concurrency: The maximum number of commands running at once across all classes
+        limits: The maximum number of commands running at once for each class
+        rate: The maximum number of commands dispatched per second, 0 for no limit
+        aging: The number of seconds after which a waiting command is promoted by one class
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, *, max_concurrency: int = 4,
+                 limits: Optional[dict[CommandPriority, int]] = None, rate: float = 0, aging: float = 5.0):
+        self.loop = loop
+        self.max_concurrency = max(1, max_concurrency)
+        self.limits = {**DEFAULT_PRIORITY_LIMITS, **(limits or {})}
+        self.rate = rate
+        self.aging = aging
+
+        self._queues: dict[CommandPriority, deque[_Ticket]] = {p: deque() for p in CommandPriority}
+        self._running: dict[CommandPriority, int] = {p: 0 for p in CommandPriority}
+        self._tokens = float(max(1.0, rate))
+        self._refilled = loop.time()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def waiting(self) -> dict[CommandPriority, int]:
+        """
+        Returns:
+            The number of commands waiting to be dispatched in each class
+        """
+        return {p: len(q) for p, q in self._queues.items()}
+
+    @property
+    def running(self) -> dict[CommandPriority, int]:
+        """
+        Returns:
+            The number of commands currently running in each class
+        """
+        return dict(self._running)
+
+    async def run(self, func: Callable[[], Awaitable[T]], priority: CommandPriority = CommandPriority.NORMAL) -> T:
+        """Run a command once the scheduler allows it
+
+        Args:
+            func: A function returning the awaitable that sends the command
+            priority: The priority class of the command
+
+        Returns:
+            The result of the awaitable
+        """
+        ticket = _Ticket(priority, self.loop.time(), self.loop.create_future())
+        self._queues[priority].append(ticket)
+        self._dispatch()
+
+        try:
+            await ticket.ready
+        except asyncio.CancelledError:
+            if ticket.ready.done() and not ticket.ready.cancelled():
+                self._release(priority)
+            elif ticket in self._queues[priority]:
+                self._queues[priority].remove(ticket)
+            raise
+
+        try:
+            return await func()
+        finally:
+            self._release(priority)
+
+    def _release(self, priority: CommandPriority) -> None:
+        self._running[priority] -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """
+        Starts as many waiting commands as the limits allow
+        """
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+
+        while sum(self._running.values()) < self.max_concurrency:
+            ticket = self._next_ticket()
+            if ticket is None:
+                return
+
+            if ticket.ready.done():
+                # The caller was cancelled while waiting
+                self._queues[ticket.priority].popleft()
+                continue
+
+            if self.rate > 0:
+                self._refill()
+                if self._tokens < 1:
+                    self._wakeup = self.loop.call_later((1 - self._tokens) / self.rate, self._dispatch)
+                    return
+                self._tokens -= 1
+
+            self._queues[ticket.priority].popleft()
+            self._running[ticket.priority] += 1
+            ticket.ready.set_result(None)
+
+    def _next_ticket(self) -> Optional[_Ticket]:
+        """
+        Picks the waiting command that should run next, among the heads of the classes that are below their limit
+        """
+        now = self.loop.time()
+        best, best_key = None, None
+
+        for priority, queue in self._queues.items():
+            if not queue or self._running[priority] >= self.limits[priority]:
+                continue
+
+            head = queue[0]
+            effective = priority - int((now - head.enqueued) / self.aging) if self.aging > 0 else priority
+            key = (effective, head.enqueued)
+
+            if best_key is None or key < best_key:
+                best, best_key = head, key
+
+        return best
+
+    def _refill(self) -> None:
+        now = self.loop.time()
+        self._tokens = min(max(1.0, self.rate), self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
@@ -3,22 +3,32 @@ from __future__ import annotations
 import asyncio
 import json
 import os
+import re
+from dataclasses import dataclass
 from pathlib import Path
-from socket import timeout, gaierror, gethostbyname
-from typing import Optional, Tuple, TYPE_CHECKING, Any
+from socket import gaierror, gethostbyname
+from typing import Optional, Tuple, TYPE_CHECKING, Any, Awaitable, Callable, Iterable, Union
 
 from discord import TextChannel
 from discord.errors import NotFound
 from websockets import WebSocketCommonProtocol
 
-from litebot.errors import ServerConnectionFailed, ServerNotFound, ServerNotRunningCarpet
+from litebot.errors import ServerConnectionFailed, ServerNotFound, ServerNotRunningCarpet, RconException, ScarpetError
 from .rpc import rpc
 from .commands.context import ServerEventContext, RPCContext
 from .commands.payload import Payload
 from .player import Player
-from .protocol import ServerQuerier, QueryResponse
-from .protocol import ServerRcon
-from .protocol import UDPSocketConnection
+from .protocol import QueryClient, QueryResponse, ServerListPing
+from .protocol import RconConnectionPool, RconPoolStats
+from .scheduler import CommandScheduler, CommandPriority
+from .cache import CommandCache
+from .dispatcher import FrameDispatcher, FrameDispatcherStats, frame_key
+from .events import EventQueue, EventQueueStats
+from .batcher import DEFAULT_BATCH_WINDOW, MessageBatcher
+from .codec import Codec, JsonCodec, DEFAULT_COMPRESSION_THRESHOLD, DEFAULT_MAX_FRAME_SIZE
+from .health import ServerHealth, ServerState
+from .poller import StatusPoller, StatusSnapshot
+from .tps_history import TpsHistory, TpsSampler, mspt_to_tps
 from .text import Text
 
 if TYPE_CHECKING:
@@ -27,12 +37,75 @@ if TYPE_CHECKING:
 SERVER_DIR_NAME = "servers"
 BACKUP_DIR_NAME = "backups"
 DEFAULT_WORLD_DIR_NAME = "world"
-TPS_COMMAND = "script run reduce(last_tick_times(),_a+_,0)/100;"
+TPS_EXPRESSION = "reduce(last_tick_times(),_a+_,0)/100"
+TPS_COMMAND = f"script run {TPS_EXPRESSION};"
+TPS_CACHE_TTL = 2
+DEFAULT_RCON_POOL_SIZE = 2
+DEFAULT_RCON_IDLE_TIMEOUT = 300
+DEFAULT_RCON_PIPELINE_DEPTH = 1
+DEFAULT_RCON_RATE_LIMIT = 0
+DEFAULT_RCON_TIMEOUT = 5
+DEFAULT_RCON_COMMAND_TIMEOUT = 60
+DEFAULT_BROADCAST_CONCURRENCY = 8
+DEFAULT_BROADCAST_TIMEOUT = 10
+DEFAULT_PROBE_TIMEOUT = 5
+CAPABILITIES_TTL = 300
+QUERY_TIMEOUT = 3
+STATUS_METHOD_QUERY = "query"
+STATUS_METHOD_PING = "ping"
+DEFAULT_STATUS_METHOD = STATUS_METHOD_QUERY
+DEFAULT_STATUS_POLL_INTERVAL = 0
+DEFAULT_STATUS_POLL_JITTER = 0.1
+DEFAULT_ROSTER_POLL_INTERVAL = 10
+DEFAULT_TPS_SAMPLE_INTERVAL = 0
+DEFAULT_DISPATCH_CONCURRENCY = 8
+DEFAULT_EVENT_QUEUE_SIZE = 1024
+DEFAULT_EVENT_MAX_IN_FLIGHT = 256
+DISCONNECT_GRACE_PERIOD = 5
+UNKNOWN_COMMAND = "Unknown or incomplete command"
+CARPET_PROBE_COMMAND = "carpet commandScript"
+SCARPET_PROBE_COMMAND = "script run 1"
+# The names in a script batch are embedded in the script as string literals
+SCRIPT_BATCH_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+@dataclass
+class ServerResult:
+    """
+    The outcome of running something on a single server through `ServerContainer.gather`
+    """
+    server: MinecraftServer
+    result: Any = None
+    error: Optional[BaseException] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def timed_out(self) -> bool:
+        return isinstance(self.error, asyncio.TimeoutError)
+
+
+@dataclass(frozen=True)
+class ServerCapabilities:
+    """
+    The optional features that a server has available
+    """
+    carpet: bool = False
+    scarpet: bool = False
 
 
 class ServerContainer:
-    def __init__(self):
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_concurrency: int = DEFAULT_BROADCAST_CONCURRENCY):
         self._list = []
+        self.max_concurrency = max_concurrency
+        self.query_client = QueryClient(loop)
+        self.server_list_ping = ServerListPing(loop)
+        self.poller = StatusPoller(loop)
+        self.tps_sampler = TpsSampler(loop)
+        self._fanout_limit: Optional[asyncio.Semaphore] = None
 
     @property
     def all(self) -> list[MinecraftServer]:
@@ -64,6 +137,104 @@ class ServerContainer:
         for i in self._list:
             yield i
 
+    def start_polling(self) -> None:
+        """
+        Starts polling the status of every server that has a `status_poll_interval` or `roster_events` set,
+        and sampling the TPS of every server that has a `tps_sample_interval` set
+        """
+        for server in self._list:
+            if server.tps_sample_interval > 0:
+                self.tps_sampler.start(server, server.tps_sample_interval)
+
+            if server.roster_events:
+                interval = server.status_poll_interval or DEFAULT_ROSTER_POLL_INTERVAL
+                self.poller.start(server, interval, server.status_poll_jitter, roster_events=True)
+            elif server.status_poll_interval > 0:
+                self.poller.start(server, server.status_poll_interval, server.status_poll_jitter)
+
+    def close(self) -> None:
+        """
+        Stops polling and sampling, and closes every server's connections
+        """
+        self.poller.stop()
+        self.tps_sampler.stop()
+        for server in self._list:
+            server.close()
+        self.query_client.close()
+
+    async def gather(self, func: Callable[[MinecraftServer], Awaitable[Any]],
+                     servers: Optional[Iterable[MinecraftServer]] = None,
+                     timeout: Optional[float] = DEFAULT_BROADCAST_TIMEOUT) -> list[ServerResult]:
+        """Runs a coroutine for every server concurrently
+
+        The number of servers being worked on at once is capped across all calls by `max_concurrency`,
+        so the total time taken is that of the slowest server rather than the sum of all of them.
+        Errors are not raised, but returned as part of each server's result.
+
+        Args:
+            func: A function taking a server and returning the awaitable to run for it
+            servers: The servers to run on, defaults to all servers
+            timeout: The maximum number of seconds to spend on each server, `None` for no limit
+
+        Returns:
+            A `ServerResult` for every server, in the same order as `servers`
+        """
+        if self._fanout_limit is None:
+            self._fanout_limit = asyncio.Semaphore(self.max_concurrency)
+
+        loop = asyncio.get_running_loop()
+
+        async def run(server: MinecraftServer) -> ServerResult:
+            async with self._fanout_limit:
+                start = loop.time()
+                try:
+                    result = await asyncio.wait_for(func(server), timeout)
+                except Exception as e:
+                    return ServerResult(server, error=e, elapsed=loop.time() - start)
+
+                return ServerResult(server, result, elapsed=loop.time() - start)
+
+        return list(await asyncio.gather(*[run(s) for s in (self._list if servers is None else servers)]))
+
+    async def broadcast(self, command: str, servers: Optional[Iterable[MinecraftServer]] = None, *,
+                        priority: CommandPriority = CommandPriority.NORMAL,
+                        timeout: Optional[float] = DEFAULT_BROADCAST_TIMEOUT) -> list[ServerResult]:
+        """Sends a command to every server concurrently
+
+        Args:
+            command: The command to send
+            servers: The servers to send the command to, defaults to all servers
+            priority: The priority class of the command
+            timeout: The maximum number of seconds to wait on each server, `None` for no limit
+
+        Returns:
+            A `ServerResult` for every server, the `result` being the response to the command
+        """
+        return await self.gather(lambda s: s.send_command(command, priority=priority), servers, timeout)
+
+    async def gather_commands(self, commands: Union[list[str], Callable[[MinecraftServer], list[str]]],
+                              servers: Optional[Iterable[MinecraftServer]] = None, *,
+                              priority: CommandPriority = CommandPriority.NORMAL,
+                              timeout: Optional[float] = DEFAULT_BROADCAST_TIMEOUT) -> list[ServerResult]:
+        """Sends a list of commands to every server concurrently
+
+        The commands for a single server are sent in order, and stop at the first one that fails.
+
+        Args:
+            commands: The commands to send, or a function taking a server and returning its commands
+            servers: The servers to send the commands to, defaults to all servers
+            priority: The priority class of the commands
+            timeout: The maximum number of seconds to spend on each server, `None` for no limit
+
+        Returns:
+            A `ServerResult` for every server, the `result` being the list of responses
+        """
+        async def send(server: MinecraftServer) -> list[Optional[str]]:
+            cmds = commands(server) if callable(commands) else commands
+            return [await server.send_command(cmd, priority=priority) for cmd in cmds]
+
+        return await self.gather(send, servers, timeout)
+
 
 class MinecraftServer:
     """
@@ -77,13 +248,55 @@ class MinecraftServer:
         self.bridge_channel_id = info["bridge_channel_id"]
         self._addr = info["numerical_server_ip"]
         self._port = info["server_port"]
-        self._rcon = ServerRcon(self.bot_instance.loop, self._addr, info["rcon_password"], info["rcon_port"])
-
-        if self.bot_instance.using_lta:
-            self._server_connection: Optional[WebSocketCommonProtocol] = None
+        # Connecting and health checks have to be quick, but commands such as `save-all flush` can take a while
+        self.rcon_timeout = info.get("rcon_timeout", DEFAULT_RCON_TIMEOUT)
+        self.rcon_command_timeout = info.get("rcon_command_timeout", DEFAULT_RCON_COMMAND_TIMEOUT)
+        self._rcon = RconConnectionPool(self.bot_instance.loop, self._addr, info["rcon_password"], info["rcon_port"],
+                                        size=info.get("rcon_pool_size", DEFAULT_RCON_POOL_SIZE),
+                                        idle_timeout=info.get("rcon_idle_timeout", DEFAULT_RCON_IDLE_TIMEOUT),
+                                        pipeline_depth=info.get("rcon_pipeline_depth", DEFAULT_RCON_PIPELINE_DEPTH),
+                                        connect_timeout=self.rcon_timeout)
+        self.scheduler = CommandScheduler(
+            self.bot_instance.loop,
+            max_concurrency=self._rcon.size * self._rcon.pipeline_depth,
+            limits={CommandPriority[k.upper()]: v for k, v in info.get("rcon_priority_limits", {}).items()},
+            rate=info.get("rcon_rate_limit", DEFAULT_RCON_RATE_LIMIT))
+        self.command_cache = CommandCache(self.bot_instance.loop)
+        self.health = ServerHealth(self.bot_instance.loop, self._rcon.ping, self._on_health_change)
+        self._capabilities: Optional[asyncio.Task] = None
+        self._capabilities_expiry = 0.0
+        self.status_poll_interval = info.get("status_poll_interval", DEFAULT_STATUS_POLL_INTERVAL)
+        self.status_poll_jitter = info.get("status_poll_jitter", DEFAULT_STATUS_POLL_JITTER)
+        self.snapshot: Optional[StatusSnapshot] = None
+        # The preferred method is tried first, the other one is the fallback
+        preferred = info.get("status_method", DEFAULT_STATUS_METHOD)
+        self._status_methods = sorted((STATUS_METHOD_QUERY, STATUS_METHOD_PING), key=lambda m: m != preferred)
+        # Join and leave events come from LiteBot-Mod when it is in use
+        self.roster_events = info.get("roster_events", False) and not self.bot_instance.using_lta
+        self.tps_sample_interval = info.get("tps_sample_interval", DEFAULT_TPS_SAMPLE_INTERVAL)
+        self.tps_history: Optional[TpsHistory] = None
+        self.dispatcher = FrameDispatcher(
+            self.bot_instance.loop, info.get("dispatch_concurrency", DEFAULT_DISPATCH_CONCURRENCY))
+        self.event_queue = EventQueue(self.bot_instance.loop, self._handle_queued_frame,
+                                      size=info.get("event_queue_size", DEFAULT_EVENT_QUEUE_SIZE),
+                                      max_in_flight=info.get("event_max_in_flight", DEFAULT_EVENT_MAX_IN_FLIGHT),
+                                      policies=info.get("event_policies"))
+
+        # Whether frames from LiteBot-Mod only need to be authenticated when the connection is established
+        self.authenticate_once = info.get("ws_authenticate_once", False)
+
+        self.message_batch_window = info.get("message_batch_window", DEFAULT_BATCH_WINDOW)
+        self.compression_threshold = info.get("ws_compression_threshold", DEFAULT_COMPRESSION_THRESHOLD)
+        self.max_frame_size = info.get("ws_max_frame_size", DEFAULT_MAX_FRAME_SIZE)
+        self.codec: Codec = JsonCodec()
+
+        # Only set once LiteBot-Mod connects, but roster events can check `server_connected` either way
+        self._server_connection: Optional[WebSocketCommonProtocol] = None
+        self._outbox: Optional[MessageBatcher] = None
 
         try:
-            self._has_valid_addr = bool(gethostbyname(self._addr))
+            self._query_host = gethostbyname(self._addr)
+            self._has_valid_addr = bool(self._query_host)
         except gaierror:
             self._has_valid_addr = False
 
@@ -152,57 +365,244 @@ class MinecraftServer:
         """
         return bool(self._server_connection) and self._server_connection.open
 
-    async def connect_server(self, socket: WebSocketCommonProtocol):
+    @property
+    def rcon_stats(self) -> RconPoolStats:
+        """
+        Returns:
+            The counters for new and reused RCON connections to this server
+        """
+        return self._rcon.stats
+
+    @property
+    def dispatch_stats(self) -> FrameDispatcherStats:
+        """
+        Returns:
+            The queue depth and counters for frames from LiteBot-Mod being handled
+        """
+        return self.dispatcher.stats
+
+    @property
+    def event_stats(self) -> EventQueueStats:
+        """
+        Returns:
+            The queue depth, and the counters for dropped and coalesced events from this server
+        """
+        return self.event_queue.stats
+
+    async def connect_server(self, socket: WebSocketCommonProtocol, codec: Optional[Codec] = None,
+                             batching: bool = False):
         """
         Connect the server's websocket connection to LiteBot-Mod
 
+        When a codec was negotiated, the server is told which one in a JSON `codec` frame,
+        and every frame after that uses it.
+
         Args:
             socket: The socket object being used to connect
+            codec: The codec negotiated for the connection, see `negotiate_codec`
+            batching: Whether the server accepts `messages` frames, otherwise every message is sent on its own
         """
         self._server_connection = socket
+        self.codec = codec or JsonCodec()
+        self._outbox = MessageBatcher(self.bot_instance.loop, self._write_frame,
+                                      self.message_batch_window if batching else 0)
         self.bot_instance.logger.info(f"WebSocket connection established to {self.name}")
 
+        if self.codec.structured_text:
+            await socket.send(json.dumps({"name": "codec", "data": self.codec.describe()}))
+
         await self.send_command_tree()
+        await self.send_event_subscriptions()
+
+    def close(self) -> None:
+        """
+        Stops probing the server's health, and closes its RCON connections
+        """
+        self.health.close()
+        self._rcon.close()
 
-    def status(self) -> QueryResponse:
+    async def disconnect_server(self, socket: WebSocketCommonProtocol) -> None:
+        """
+        Called once a websocket connection to LiteBot-Mod has closed.
+        Queued frames get `DISCONNECT_GRACE_PERIOD` seconds to be dispatched, then the event queue
+        stops draining, and frames that are still being handled are cancelled.
+
+        Args:
+            socket: The socket object of the connection that closed
+        """
+        if self._server_connection is not socket:
+            # The server has already connected again
+            return
+
+        self.bot_instance.logger.info(f"WebSocket connection to {self.name} closed")
+        try:
+            # Events sent right before closing, such as the server stopping, still get dispatched
+            await asyncio.wait_for(self.event_queue.join(), DISCONNECT_GRACE_PERIOD)
+        except asyncio.TimeoutError:
+            pass
+
+        if self._server_connection is not socket:
+            return
+
+        self._server_connection = None
+        self.event_queue.close()
+        self.dispatcher.cancel()
+
+    async def status(self, timeout: float = QUERY_TIMEOUT, *, fresh: bool = False) -> QueryResponse:
         """Get the server status
 
-        The server's status includes the MOTD and a list of online players
+        The server's status includes the MOTD and a list of online players.
+        It is fetched with the server's `status_method`, either the query protocol or a server list ping.
+        If that fails the other method is tried, and is used first from then on if it works.
+        If the server's status is being polled, the latest snapshot is returned instead of querying the server.
+        The status doesn't depend on the server's `health`, which only tracks RCON,
+        so servers without RCON still report their status.
+
+        Args:
+            timeout: The maximum number of seconds to wait for the server, the fallback only gets what is left of it
+            fresh: Whether to always query the server, even if there is a snapshot
 
         Returns:
             A `QueryResponse` object containing the results from quering the server
         """
+        if not fresh and self.snapshot is not None:
+            return self.snapshot.status
+
         if not self._has_valid_addr:
             return QueryResponse(status=False)
 
-        try:
-            connection = UDPSocketConnection((self._addr, self._port))
-            querier = ServerQuerier(connection)
-            querier.handshake()
-            return querier.read_query()
-        except timeout:
-            return QueryResponse(status=False)
-        except:
-            return QueryResponse(status=False)
+        deadline = self.bot_instance.loop.time() + timeout
+        for method in list(self._status_methods):
+            remaining = deadline - self.bot_instance.loop.time()
+            if remaining <= 0:
+                break
 
-    async def tps(self) -> Tuple[float, float]:
+            try:
+                response = await self._fetch_status(method, remaining)
+            except Exception:
+                continue
+
+            if method != self._status_methods[0]:
+                self.bot_instance.logger.info(f"Using {method} to get the status of {self.name}")
+                self._status_methods.remove(method)
+                self._status_methods.insert(0, method)
+
+            return response
+
+        return QueryResponse(status=False)
+
+    async def _fetch_status(self, method: str, timeout: float) -> QueryResponse:
+        servers = self.bot_instance.servers
+        if method == STATUS_METHOD_PING:
+            return await servers.server_list_ping.status((self._query_host, self._port), timeout)
+
+        return await servers.query_client.query((self._query_host, self._port), timeout)
+
+    async def tps(self, priority: CommandPriority = CommandPriority.NORMAL) -> Tuple[float, float]:
         """Get the server's TPS and MSPT
 
         This is done via the use of Carpet-Mod. The result is
         the average of the past 100 ticks
 
+        Args:
+            priority: The priority class of the command
+
         Returns:
             The server's TPS and MSPT
         """
-        res = await self.send_command(TPS_COMMAND)
+        res = await self.send_command(TPS_COMMAND, priority=priority, cache_ttl=TPS_CACHE_TTL)
         try:
             float(res.split()[1])
         except ValueError:
             raise ServerNotRunningCarpet
 
         mspt = round(float(res.split()[1]), 1)
-        tps = 20.0 if mspt <= 50.0 else 1000 / mspt
-        return mspt, round(float(tps), 1)
+        return mspt, round(mspt_to_tps(mspt), 1)
+
+    async def script_batch(self, expressions: dict[str, str], *, priority: CommandPriority = CommandPriority.NORMAL,
+                           cache_ttl: Optional[float] = None) -> dict[str, Any]:
+        """Evaluates several scarpet expressions in a single command
+
+        The expressions are combined into one `script run` that returns a JSON map,
+        so they only cost one round trip and one compilation on the server.
+        If any expression fails, the whole batch fails.
+
+        Example:
+            `await server.script_batch({"tps": TPS_EXPRESSION, "objectives": "scoreboard()"})`
+
+        Args:
+            expressions: The expressions to evaluate, keyed by the name their result will be returned under,
+                which has to be an identifier
+            priority: The priority class of the command
+            cache_ttl: The number of seconds the response can be served from the cache for
+
+        Returns:
+            The result of every expression, keyed by the expression's name
+
+        Raises:
+            ServerConnectionFailed
+            ServerNotRunningCarpet
+            ScarpetError
+            ValueError
+        """
+        if invalid := [name for name in expressions if not SCRIPT_BATCH_NAME.fullmatch(name)]:
+            raise ValueError(f"Invalid script batch names: {', '.join(map(repr, invalid))}")
+
+        entries = ", ".join(f"'{name}' -> ({expr})" for name, expr in expressions.items())
+        res = await self.send_command(f"script run encode_json({{{entries}}})", priority=priority, cache_ttl=cache_ttl)
+
+        if not res or UNKNOWN_COMMAND in res:
+            # The cached capabilities are out of date
+            self._capabilities = None
+            raise ServerNotRunningCarpet
+
+        match = re.search(r"{.*}", res, re.DOTALL)
+        try:
+            results = json.loads(match.group(0))
+        except (AttributeError, ValueError):
+            raise ScarpetError(res)
+
+        return {name: results.get(name) for name in expressions}
+
+    async def capabilities(self, timeout: float = DEFAULT_PROBE_TIMEOUT, *, fresh: bool = False) -> ServerCapabilities:
+        """Get the optional features that the server has available
+
+        The result of probing the server is cached for `CAPABILITIES_TTL` seconds, or until the server goes down
+        or a script fails because carpet is missing. Concurrent callers share the same probe.
+
+        Args:
+            timeout: The maximum number of seconds to wait for the probe
+            fresh: Whether to probe the server again, even if the cached result hasn't expired
+
+        Returns:
+            The server's capabilities
+
+        Raises:
+            ServerConnectionFailed
+        """
+        now = self.bot_instance.loop.time()
+        if self._capabilities is None or (self._capabilities.done() and (fresh or now >= self._capabilities_expiry)):
+            self._capabilities = self.bot_instance.loop.create_task(self._probe_capabilities())
+            self._capabilities_expiry = now + CAPABILITIES_TTL
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._capabilities), timeout)
+        except asyncio.TimeoutError:
+            raise ServerConnectionFailed
+
+    async def _probe_capabilities(self) -> ServerCapabilities:
+        # The probes only read, so they go through the cache with a zero TTL instead of clearing it like writes
+        try:
+            scarpet = await self.send_command(SCARPET_PROBE_COMMAND, priority=CommandPriority.INTERACTIVE,
+                                              cache_ttl=0, timeout=self.rcon_timeout)
+            carpet = await self.send_command(CARPET_PROBE_COMMAND, priority=CommandPriority.INTERACTIVE,
+                                             cache_ttl=0, timeout=self.rcon_timeout)
+        except ServerConnectionFailed:
+            self._capabilities = None
+            raise
+
+        scarpet = UNKNOWN_COMMAND not in (scarpet or "")
+        return ServerCapabilities(carpet=scarpet or UNKNOWN_COMMAND not in (carpet or ""), scarpet=scarpet)
 
     async def stop(self) -> bool:
         """
@@ -212,14 +612,66 @@ class MinecraftServer:
 
         while server_online:
             try:
-                await self.send_command("stop")
-                server_online = self.status().online
+                await self.send_command("stop", priority=CommandPriority.BACKGROUND)
+                server_online = (await self.status(fresh=True)).online
                 await asyncio.sleep(2)
             except ServerConnectionFailed:
                 server_online = False
 
         return server_online
 
+    def _on_health_change(self, old: ServerState, new: ServerState) -> None:
+        """Dispatches events when the server's health changes
+
+        Plugins can listen to `on_server_state_change(server, old, new)`, as well as
+        `on_server_up(server)` and `on_server_down(server)` as discord listeners.
+        """
+        self.bot_instance.logger.info(f"{self.name} is now {new.value} (was {old.value})")
+        if new is ServerState.DOWN:
+            # The server may come back with different mods or settings
+            self._capabilities = None
+
+        self.bot_instance.dispatch("server_state_change", self, old, new)
+
+        if new is ServerState.DOWN and old is not ServerState.PROBING:
+            self.bot_instance.dispatch("server_down", self)
+        elif new is ServerState.UP and old in (ServerState.DOWN, ServerState.PROBING):
+            self.bot_instance.dispatch("server_up", self)
+
+    def submit(self, action: str, data: dict,
+               reply: Optional[Callable[[Any], Awaitable[None]]] = None) -> asyncio.Task:
+        """Queues an action from the server on its `FrameDispatcher`
+
+        Actions from the same player, and events that have to stay in order, are dispatched one after another.
+        Everything else is dispatched concurrently, so a slow command doesn't hold up the rest of the server.
+
+        Args:
+            action: The action that will be dispatched
+            data: The data for the dispatching the action
+            reply: Called with the result of the action, if there is one
+
+        Returns:
+            The task dispatching the action
+        """
+        async def run():
+            res = await self.dispatch(action, data)
+            if res is not None and reply is not None:
+                await reply(res)
+            return res
+
+        return self.dispatcher.submit(frame_key(action, data), run)
+
+    def _handle_queued_frame(self, action: str, data: dict,
+                             reply: Optional[Callable[[Any], Awaitable[None]]] = None,
+                             done: Optional[Callable[[asyncio.Task], None]] = None) -> asyncio.Task:
+        task = self.submit(action, data, reply=reply)
+        task.add_done_callback(done or self._log_frame_error)
+        return task
+
+    def _log_frame_error(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and (e := task.exception()):
+            self.bot_instance.logger.exception(e, exc_info=e)
+
     async def dispatch(self, action: str, data: dict) -> None:
         """Dispatches an action from the server.
 
@@ -250,10 +702,10 @@ class MinecraftServer:
                     return await self.send_message(Text.error_message("You are not authorized to run this command!"))
 
             await ctx.invoke()
-            await self._server_connection.send(json.dumps({
+            await self.send_frame({
                 "name": "server_command_after_invoke",
                 "data": {"name": data["name"], "args": ctx.after_invoke_args}
-            }))
+            })
         except TypeError as e:
             print(e)
             pass
@@ -265,12 +717,21 @@ class MinecraftServer:
             The data being used to dispatch the event
         """
         events = self.bot_instance.server_events.get(data["name"], [])
+        if not events:
+            # Servers are told which events have listeners, but older versions of the mod send everything
+            return
+
         ctx = ServerEventContext(self, self.bot_instance, data.get("player", ""))
         payload = Payload.get_event_payload(data["name"])(ctx, data.get("args"))
 
+        tasks = []
         for event in events:
             args = (ctx.with_setting(event), payload) if hasattr(event, "__setting__") else (ctx, payload)
-            asyncio.create_task(event(*args), name=f"{self.name}-event: {data['name']}")
+            tasks.append(asyncio.create_task(event(*args), name=f"{self.name}-event: {data['name']}"))
+
+        # The dispatcher only starts the next ordered frame once every listener is done with this one
+        if tasks:
+            await asyncio.wait(tasks)
 
     async def _dispatch_rpc(self, data: dict) -> Any:
         """Executes an RPC method from the server
@@ -313,16 +774,59 @@ class MinecraftServer:
             if all([await r(self.bot_instance, self) for r in s.requirements]):
                 data.append(s.build())
 
-        await self._server_connection.send(json.dumps({
+        await self.send_frame({
             "name": "server_command_registers",
             "data": data
-        }))
+        })
+
+    async def send_frame(self, frame: dict) -> None:
+        """Sends a frame to LiteBot-Mod, encoded with the connection's codec
 
-    async def send_command(self, command: str) -> Optional[str]:
+        Messages that are waiting to be batched are sent first, so that the frame can't overtake them.
+
+        Args:
+            frame: The frame to send
+        """
+        if self._outbox is not None:
+            await self._outbox.flush()
+
+        await self._write_frame(frame)
+
+    async def _write_frame(self, frame: dict) -> None:
+        await self._server_connection.send(self.codec.encode(frame))
+
+    async def send_event_subscriptions(self):
+        """Sends the names of the events that have listeners to the server if the server is connected
+
+        LiteBot-Mod can then skip sending any other events.
+        """
+        if not self.server_connected:
+            return
+
+        await self.send_frame({
+            "name": "server_event_subscriptions",
+            "data": self.bot_instance.subscribed_events
+        })
+
+    async def send_command(self, command: str, *, priority: CommandPriority = CommandPriority.NORMAL,
+                           cache_ttl: Optional[float] = None, timeout: Optional[float] = None) -> Optional[str]:
         """Executes a command on the server
 
+        Commands go through the server's `CommandScheduler`, commands run on behalf of a person
+        should use `CommandPriority.INTERACTIVE`, and automated work `CommandPriority.BACKGROUND`.
+
+        Read-only commands can pass a `cache_ttl`, identical commands sent at the same time will then
+        share a single call, and the response is reused for `cache_ttl` seconds.
+        Any command sent without a `cache_ttl` is treated as a write, and clears the server's cache
+        both before it is sent and once it has completed.
+        A command that hasn't been answered within `timeout` seconds fails. Only connection errors count
+        against the server's health, a slow command doesn't mean that the server is down.
+
         Args:
             command: The command to send to the server
+            priority: The priority class of the command
+            cache_ttl: The number of seconds the response of a read-only command can be reused for
+            timeout: The number of seconds to wait for the response, `rcon_command_timeout` by default
 
         Returns:
             The server's response from executing the command
@@ -330,15 +834,32 @@ class MinecraftServer:
         Raises:
             ServerConnectionFaield
         """
-        if not self._has_valid_addr:
+        if not self._has_valid_addr or not self.health.available:
             raise ServerConnectionFailed
 
+        timeout = self.rcon_command_timeout if timeout is None else timeout
+
+        def send():
+            return self.scheduler.run(lambda: asyncio.wait_for(self._rcon.command(command), timeout), priority)
+
         try:
-            await self._rcon.connect()
-        except Exception:
+            if cache_ttl is not None:
+                resp = await self.command_cache.get(command, cache_ttl, send)
+            else:
+                self.command_cache.invalidate()
+                try:
+                    resp = await send()
+                finally:
+                    # Reads sent while the write was waiting or running may have been answered before it
+                    self.command_cache.invalidate()
+        except asyncio.TimeoutError:
             raise ServerConnectionFailed
+        except (OSError, RconException):
+            self.health.record_failure()
+            raise ServerConnectionFailed
+
+        self.health.record_success()
 
-        resp = await self._rcon.command(command)
         if resp:
             return resp
 
@@ -361,19 +882,22 @@ class MinecraftServer:
             raise ServerConnectionFailed
 
         try:
-            self._rcon.sync_connect()
-        except:
+            resp = self._rcon.sync_command(command)
+        except (OSError, RconException):
             raise ServerConnectionFailed
 
-        resp = self._rcon.sync_command(command)
         if resp:
             return resp
 
     async def send_message(self, text: Text, *, op_only: Optional[bool] = False,
-                           player: Optional[Player] = None) -> None:
+                           player: Optional[Player] = None) -> Optional[asyncio.Future]:
         """
         Sends a system message to the server, only works if server is running LTA
 
+        For servers that offered `batching` when connecting, messages sent within `message_batch_window`
+        seconds of each other are sent to the server together, see `MessageBatcher`.
+        This then returns once the message is queued, without waiting for it to be sent.
+
         Examples:
             {
                 "message": "This is an example message",
@@ -384,11 +908,15 @@ class MinecraftServer:
             text: The text to send to the server
             player: The player to send the message to
             op_only: Whether the message is only for OP players
+
+        Returns:
+            A future that is done once the message has been sent, if it was queued to be batched
         """
         if not self.server_connected:
             return
 
-        message = text.build()
+        # Messages are only embedded as strings for servers that didn't negotiate a codec
+        message = text.components() if self.codec.structured_text else text.build()
         payload = {"message": message}
 
         if op_only:
@@ -396,5 +924,5 @@ class MinecraftServer:
         if player:
             payload["player"] = player.uuid
 
-        await self._server_connection.send(json.dumps({"name": "message", "data": payload}))
+        return await self._outbox.send(payload)
 
@@ -101,6 +101,13 @@ class Text:
         """
         return str([i.build() for i in self._repr]).replace("'", "").replace("\\\\", "\\")
 
+    def components(self) -> list[dict]:
+        """
+        Returns:
+            The components of the text, to be sent without encoding them to a string first
+        """
+        return [dict(i.__dict__) for i in self._repr]
+
 class _TextComponent:
     def __init__(self, **kwargs):
         """
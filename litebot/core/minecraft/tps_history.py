@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import random
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Optional, TYPE_CHECKING
+
+from litebot.errors import MinecraftServerException
+from .scheduler import CommandPriority
+
+if TYPE_CHECKING:
+    from .server import MinecraftServer
+
+# The number of seconds each sample of a tier covers, and how many samples the tier keeps
+HISTORY_TIERS = (
+    (60, 1440),  # A minute for a day
+    (3600, 720),  # An hour for a month
+    (86400, 365)  # A day for a year
+)
+RAW_HISTORY_SIZE = 720
+MSPT_PER_TICK = 50.0
+
+
+def mspt_to_tps(mspt: float) -> float:
+    return 20.0 if mspt <= MSPT_PER_TICK else 1000 / mspt
+
+
+@dataclass
+class TpsStats:
+    """
+    Statistics about the MSPT of a server over a window of time.
+    Windows older than the raw history are answered from a downsampled tier, the percentiles
+    are then percentiles of the means over `resolution` seconds, rather than of single samples.
+    """
+    window: float
+    resolution: float
+    samples: int
+    mean: float
+    min: float
+    max: float
+    p50: float
+    p95: float
+    p99: float
+    percentiles_of_means: bool = False
+
+    @property
+    def tps(self) -> float:
+        """
+        Returns:
+            The TPS for the mean MSPT
+        """
+        return round(mspt_to_tps(self.mean), 1)
+
+    def serialize(self) -> dict:
+        return {
+            "window": self.window,
+            "resolution": self.resolution,
+            "samples": self.samples,
+            "tps": self.tps,
+            "mspt": {"mean": self.mean, "min": self.min, "max": self.max,
+                     "p50": self.p50, "p95": self.p95, "p99": self.p99},
+            "percentiles_of": "means" if self.percentiles_of_means else "samples"
+        }
+
+
+class _Ring:
+    """
+    A fixed size ring buffer of (timestamp, mean, min, max) samples, backed by arrays of doubles
+    """
+
+    def __init__(self, resolution: float, capacity: int):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.timestamps = array("d", bytes(8 * capacity))
+        self.means = array("d", bytes(8 * capacity))
+        self.mins = array("d", bytes(8 * capacity))
+        self.maxes = array("d", bytes(8 * capacity))
+        self.head = 0
+        self.count = 0
+
+        # The bucket that is currently being filled, before it is pushed
+        self._bucket: Optional[float] = None
+        self._sum = self._n = 0.0
+        self._min = math.inf
+        self._max = -math.inf
+
+    @property
+    def span(self) -> float:
+        return self.resolution * self.capacity
+
+    @property
+    def oldest(self) -> float:
+        """
+        The timestamp of the oldest sample kept, only meaningful if there are any
+        """
+        return self.timestamps[(self.head - self.count) % self.capacity]
+
+    def push(self, timestamp: float, mean: float, min_: float, max_: float) -> None:
+        self.timestamps[self.head] = timestamp
+        self.means[self.head] = mean
+        self.mins[self.head] = min_
+        self.maxes[self.head] = max_
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def add(self, timestamp: float, mean: float, min_: float, max_: float) -> Optional[tuple[float, float, float, float]]:
+        """
+        Adds a sample to the current bucket, returns the finished bucket once a sample falls into the next one
+        """
+        bucket = timestamp - timestamp % self.resolution
+        finished = None
+
+        if self._bucket is not None and bucket != self._bucket:
+            finished = (self._bucket, self._sum / self._n, self._min, self._max)
+            self.push(*finished)
+            self._sum = self._n = 0.0
+            self._min, self._max = math.inf, -math.inf
+
+        self._bucket = bucket
+        self._sum += mean
+        self._n += 1
+        self._min = min(self._min, min_)
+        self._max = max(self._max, max_)
+        return finished
+
+    def covers(self, start: float) -> bool:
+        """
+        Whether every sample since `start` that was ever pushed is still kept,
+        either because the oldest sample kept is from at or before `start`, or because none were dropped yet
+        """
+        return self.count < self.capacity or self.oldest <= start
+
+    def since(self, start: float) -> list[int]:
+        """
+        The indexes of the samples taken at or after `start`, oldest first,
+        including a bucket that was still being filled at `start`
+        """
+        first = (self.head - self.count) % self.capacity
+        indexes = [(first + i) % self.capacity for i in range(self.count)]
+        return [i for i in indexes if self.timestamps[i] + self.resolution > start or self.timestamps[i] >= start]
+
+
+class TpsHistory:
+    """Keeps the MSPT history of a server in bounded memory
+
+    Raw samples are kept in a ring buffer, and are also downsampled into coarser tiers,
+    each of which is a ring buffer of its own. Queries over a window use the finest tier
+    that still has all of it, so memory use never grows no matter how long the bot runs.
+    """
+
+    def __init__(self, raw_size: int = RAW_HISTORY_SIZE, tiers: tuple[tuple[float, int], ...] = HISTORY_TIERS):
+        self._raw = _Ring(0, raw_size)
+        self._tiers = [_Ring(resolution, capacity) for resolution, capacity in tiers]
+        self._interval = 0.0
+        self._last: Optional[float] = None
+
+    def record(self, mspt: float, timestamp: Optional[float] = None) -> None:
+        """Record a sample
+
+        Args:
+            mspt: The MSPT of the server
+            timestamp: The time the sample was taken, now by default
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        if self._last is not None:
+            self._interval = timestamp - self._last
+        self._last = timestamp
+
+        self._raw.push(timestamp, mspt, mspt, mspt)
+
+        sample = (timestamp, mspt, mspt, mspt)
+        for tier in self._tiers:
+            sample = tier.add(*sample)
+            if sample is None:
+                break
+
+    def stats(self, window: float, now: Optional[float] = None) -> Optional[TpsStats]:
+        """Get statistics about the MSPT over a window of time
+
+        Args:
+            window: The number of seconds to look back
+            now: The end of the window, now by default
+
+        Returns:
+            The statistics, or None if there are no samples in the window
+        """
+        now = time.time() if now is None else now
+        start = now - window
+        ring = self._raw
+
+        if not self._raw.covers(start):
+            ring = next((tier for tier in self._tiers if tier.count and tier.covers(start)), None)
+            if ring is None:
+                # Nothing goes back far enough, so use whatever goes back the furthest
+                ring = min((r for r in (self._raw, *self._tiers) if r.count), key=lambda r: r.oldest)
+
+        resolution = self._interval if ring is self._raw else ring.resolution
+
+        indexes = ring.since(start)
+        if not indexes:
+            return None
+
+        means = sorted(ring.means[i] for i in indexes)
+        return TpsStats(
+            window=window,
+            resolution=resolution,
+            samples=len(means),
+            mean=round(sum(means) / len(means), 1),
+            min=round(min(ring.mins[i] for i in indexes), 1),
+            max=round(max(ring.maxes[i] for i in indexes), 1),
+            p50=round(_percentile(means, 50), 1),
+            p95=round(_percentile(means, 95), 1),
+            p99=round(_percentile(means, 99), 1),
+            percentiles_of_means=ring is not self._raw
+        )
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    """
+    The nearest rank percentile of already sorted values
+    """
+    return values[max(0, math.ceil(percentile / 100 * len(values)) - 1)]
+
+
+class TpsSampler:
+    """Samples the MSPT of servers in the background into their `tps_history`
+
+    Args:
+        loop: The event loop to sample on
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def start(self, server: MinecraftServer, interval: float) -> None:
+        """Start sampling a server
+
+        Args:
+            server: The server to sample
+            interval: The number of seconds between samples
+        """
+        self.stop(server)
+        if server.tps_history is None:
+            server.tps_history = TpsHistory()
+        self._tasks[server.name] = self.loop.create_task(self._run(server, interval))
+
+    def stop(self, server: Optional[MinecraftServer] = None) -> None:
+        """Stop sampling a server
+
+        Args:
+            server: The server to stop sampling, or every server if not given
+        """
+        names = [server.name] if server else list(self._tasks)
+        for name in names:
+            task = self._tasks.pop(name, None)
+            if task:
+                task.cancel()
+
+    async def _run(self, server: MinecraftServer, interval: float) -> None:
+        await asyncio.sleep(random.uniform(0, interval))
+
+        while True:
+            try:
+                mspt, _ = await server.tps(priority=CommandPriority.BACKGROUND)
+                server.tps_history.record(mspt)
+            except MinecraftServerException:
+                # The server is offline or doesn't have carpet, there's nothing to record
+                pass
+            except Exception as e:
+                server.bot_instance.logger.warning(f"Failed to sample the TPS of {server.name}: {e!r}")
+
+            await asyncio.sleep(interval)
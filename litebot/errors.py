@@ -68,6 +68,14 @@ class ServerNotRunningCarpet(MinecraftServerException):
     pass
 
 
+class ScarpetError(MinecraftServerException):
+    """
+    Exception produced when a scarpet expression sent to the server
+    could not be evaluated
+    """
+    pass
+
+
 class BaseCommandError(LiteBotException, commands.errors.CommandError):
     """
     Base exception for custom command errors
@@ -76,10 +76,11 @@ class GroupMixin(commands.GroupMixin):
             func: The listener for the event
             name: The name of the handler
         """
-        if name in self.server_events:
-            return self.server_events[name].append(func)
+        subscribed = bool(self.server_events.get(name))
+        self.server_events.setdefault(name, []).append(func)
 
-        self.server_events[name] = [func]
+        if not subscribed:
+            self._on_subscriptions_change()
 
     def remove_server_listener(self, func, name):
         """Remove a server listener
@@ -90,6 +91,23 @@ class GroupMixin(commands.GroupMixin):
         """
         self.server_events[name] = list(filter(lambda e: e is not func, self.server_events[name]))
 
+        if not self.server_events[name]:
+            self._on_subscriptions_change()
+
+    @property
+    def subscribed_events(self) -> list[str]:
+        """
+        Returns:
+            The names of the server events that have at least one listener
+        """
+        return sorted(name for name, listeners in self.server_events.items() if listeners)
+
+    def _on_subscriptions_change(self):
+        """
+        Called when an event gets its first listener, or loses its last one
+        """
+        pass
+
 class LiteBot(GroupMixin, commands.Bot):
     VERSION = "3.0.1"
 
@@ -105,6 +123,7 @@ class LiteBot(GroupMixin, commands.Bot):
             intents=discord.Intents.all(),
             case_insensitive=True)
         GroupMixin.__init__(self)
+        self._subscriptions_pending = False
         self.logger = get_logger("bot")
 
         self.db = mongoengine.connect("bot", host="mongo", port=27017)
@@ -115,6 +134,7 @@ class LiteBot(GroupMixin, commands.Bot):
         self.using_lta = bool(os.environ.get("USING_LTA"))
         self.__server = Sanic(APP_NAME)
         self.servers = self._init_servers()
+        self.servers.start_polling()
         self.loop.create_task(asyncio.to_thread(self._dispatch_timers))
 
     @property
@@ -173,6 +193,13 @@ class LiteBot(GroupMixin, commands.Bot):
         self.processing_plugin = plugin
         super().unload_extension(plugin.path)
 
+    async def close(self):
+        """
+        Closes the connections to the servers before logging out
+        """
+        self.servers.close()
+        await super().close()
+
     async def on_ready(self):
         """
         on_ready logger
@@ -202,8 +229,21 @@ class LiteBot(GroupMixin, commands.Bot):
                                           access_log=False)
         self.loop.create_task(coro)
 
+    def _on_subscriptions_change(self):
+        # Plugins add their listeners one at a time, so the servers are only told once they're all in
+        if self._subscriptions_pending or not hasattr(self, "servers"):
+            return
+
+        self._subscriptions_pending = True
+        self.loop.call_soon(self._send_subscriptions)
+
+    def _send_subscriptions(self):
+        self._subscriptions_pending = False
+        for server in self.servers:
+            self.loop.create_task(server.send_event_subscriptions())
+
     def _init_servers(self):
-        container = ServerContainer()
+        container = ServerContainer(self.loop)
         for server in self.config["servers"]:
             container.append(MinecraftServer(server, self, **self.config["servers"][server]))
         return container
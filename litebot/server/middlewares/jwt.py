@@ -1,6 +1,7 @@
 from sanic.request import Request
 from sanic import exceptions
-import re, jwt
+import re, jwt, time, hashlib
+from collections import OrderedDict
 from typing import NoReturn, Union, Optional
 
 from litebot.errors import AuthFailure
@@ -8,10 +9,76 @@ from litebot.utils.logging import get_logger
 
 logger = get_logger("bot")
 ALGORITHMS = ["HS256", "HS512"]
+TOKEN_CACHE_SIZE = 1024
+
+class TokenCache:
+    """A bounded LRU cache of tokens that have already been verified
+
+    Entries are keyed by a digest of the token, so the tokens themselves aren't kept around.
+    Tokens are only served from the cache until their `exp`, after which they are decoded again
+    so that PyJWT can reject them. The whole cache is flushed when the secret changes.
+
+    Args:
+        size: The maximum number of tokens to keep
+    """
+
+    def __init__(self, size: int = TOKEN_CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self._secret: Optional[str] = None
+
+    def decode(self, token: str, secret: str) -> dict:
+        """Decode a token, verifying it only if it isn't in the cache
+
+        Args:
+            token: The token to decode
+            secret: The secret to verify the token with
+
+        Returns:
+            The decoded token payload
+
+        Raises:
+            jwt.InvalidTokenError
+        """
+        if secret != self._secret:
+            self.clear()
+            self._secret = secret
+
+        key = hashlib.sha256(token.encode()).digest()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.time():
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return dict(entry[1])
+
+            del self._entries[key]
+
+        self.misses += 1
+        payload = jwt.decode(token, secret, algorithms=ALGORITHMS)
+
+        exp = payload.get("exp")
+        self._entries[key] = (float(exp) if isinstance(exp, (int, float)) else float("inf"), payload)
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+        return dict(payload)
+
+    def clear(self) -> None:
+        """
+        Drops every cached token
+        """
+        self._entries.clear()
+
+token_cache = TokenCache()
 
 def validate_jwt(token: str, secret: str) -> Optional[dict]:
     """Validate a JWT
 
+    Tokens that were already verified with the same secret are served from `token_cache`.
+
     Args:
         token: The token to validate
         secret: The secret to validate the token with
@@ -23,7 +90,7 @@ def validate_jwt(token: str, secret: str) -> Optional[dict]:
         AuthFailure
     """
     try:
-        return jwt.decode(token, secret, algorithms=ALGORITHMS)
+        return token_cache.decode(token, secret)
     except jwt.InvalidTokenError as e:
         raise AuthFailure(e)
 
@@ -55,7 +122,7 @@ async def validate_jwt_headers(request: Request, secret: str, auth_scheme: Optio
 
     if token:
         try:
-            decoded = jwt.decode(token.removesuffix("\n").removesuffix("\r"), secret, algorithms=ALGORITHMS)
+            decoded = token_cache.decode(token.removesuffix("\n").removesuffix("\r"), secret)
         except jwt.InvalidTokenError as jet:
             logger.exception(jet, exc_info=jet)
             raise exceptions.Unauthorized(message=f"Invalid Authorization token, {jet}")
@@ -83,7 +150,7 @@ async def validate_jwt_query(request: Request, secret: str) -> Union[NoReturn, d
         raise exceptions.Forbidden("Missing token in request arguments!")
 
     try:
-        decoded = jwt.decode(token, secret, algorithms=ALGORITHMS)
+        decoded = token_cache.decode(token, secret)
     except jwt.InvalidTokenError as jet:
         logger.exception(jet, exc_info=jet)
         raise exceptions.Unauthorized(message=f"Invalid Authorization token, {jet}")
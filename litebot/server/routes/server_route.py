@@ -1,21 +1,29 @@
-import json
+import asyncio
+import zlib
+from functools import partial
 
 from sanic.request import Request
+from websockets import ConnectionClosed
 
-from sanic import Blueprint
+from sanic import Blueprint, json as json_response
 from ..middlewares.jwt import validate_jwt
 
+from ...core.minecraft.codec import Codec, JsonCodec, negotiate_codec
 from ...errors import AuthFailure, ServerNotFound
 
 blueprint = Blueprint("server", url_prefix="/server")
 
 FETCH_ROUTE = "/fetch/<item:string>"
+TPS_HISTORY_ROUTE = "/<name:string>/tps"
+DEFAULT_TPS_WINDOW = 3600
 
 @blueprint.websocket("/")
 async def _websocket(request: Request, socket):
     """A websocket route at / that is used to establish a connection with the server.
 
-    Excpects messages to be sent in a JSON format
+    Excpects messages to be sent in a JSON format, until a codec is negotiated.
+    The first frame can offer `codecs` and `compression`, see `negotiate_codec`,
+    and set `batching` if the server accepts several messages in a single `messages` frame.
     Once a connection is established, it is used to communicate with the server.
     Each time the server sends data, it must include a `auth` JWT token.
     The token payload must contain the name of the server that the data is coming from, as well as the action that is being performed.
@@ -26,21 +34,87 @@ async def _websocket(request: Request, socket):
             "action": "event"
         }
 
+    For servers with `ws_authenticate_once` enabled, only the first frame needs the token,
+    and the connection is bound to that server. Later frames can then leave out `auth`,
+    and give the action as `action` and an id for RPC replies as `id` instead.
     """
-    async for message in socket:
-        try:
-            data: dict = json.loads(message)
-            payload = validate_jwt(data["auth"], request.app.config.BOT_INSTANCE.config["api_secret"])
-            server = request.app.config.BOT_INSTANCE.servers[payload["server_name"]]
-
-            if not server.server_connected:
-                await server.connect_server(socket)
-            else:
-                res = await server.dispatch(payload["action"], data)
-                if res is not None:
-                    await socket.send(json.dumps({"id": data["auth"], "res": res}))
-        except AuthFailure:
-            await socket.close(reason="Invalid Authorization Token!")
-        except (KeyError, json.JSONDecodeError, ServerNotFound):
-            await socket.send(json.dumps({"error": "Invalid Data!"}))
+    session = None
+    codec: Codec = JsonCodec()
+    try:
+        async for message in socket:
+            try:
+                data: dict = codec.decode(message)
+                if session is not None and session.authenticate_once and "auth" not in data:
+                    server, action = session, data["action"]
+                else:
+                    payload = validate_jwt(data["auth"], request.app.config.BOT_INSTANCE.config["api_secret"])
+                    server, action = request.app.config.BOT_INSTANCE.servers[payload["server_name"]], payload["action"]
 
+                if not server.server_connected:
+                    codec = negotiate_codec(data.get("codecs"), data.get("compression"),
+                                            server.compression_threshold, server.max_frame_size)
+                    await server.connect_server(socket, codec, batching=data.get("batching", False))
+                    session, codec = server, server.codec
+                else:
+                    # Frames are handled concurrently, so reading the next one doesn't wait for a slow command
+                    reply = partial(_reply, socket, codec, data.get("auth", data.get("id")))
+                    done = partial(_frame_done, socket, codec, request.app.config.BOT_INSTANCE.logger)
+                    if action in ("event", "command"):
+                        # Events and commands share a bounded queue, so a player's command can't overtake their
+                        # earlier events. This only waits if the server is sending more than it can take
+                        await server.event_queue.put(data, action=action, reply=reply, done=done)
+                    else:
+                        server.submit(action, data, reply=reply).add_done_callback(done)
+            except AuthFailure:
+                await socket.close(reason="Invalid Authorization Token!")
+            except (KeyError, ValueError, zlib.error, ServerNotFound):
+                await socket.send(codec.encode({"error": "Invalid Data!"}))
+    finally:
+        if session is not None:
+            await session.disconnect_server(socket)
+
+
+async def _reply(socket, codec: Codec, id_: str, res) -> None:
+    try:
+        await socket.send(codec.encode({"id": id_, "res": res}))
+    except ConnectionClosed:
+        # The server disconnected while the frame was being handled
+        pass
+
+
+def _frame_done(socket, codec: Codec, logger, task: asyncio.Task) -> None:
+    if task.cancelled() or not (e := task.exception()):
+        return
+
+    if isinstance(e, (KeyError, ServerNotFound)):
+        asyncio.create_task(_send_error(socket, codec))
+    else:
+        logger.exception(e, exc_info=e)
+
+
+async def _send_error(socket, codec: Codec) -> None:
+    try:
+        await socket.send(codec.encode({"error": "Invalid Data!"}))
+    except ConnectionClosed:
+        pass
+
+
+@blueprint.route(TPS_HISTORY_ROUTE, methods=["GET"])
+async def _tps_history(request: Request, name: str):
+    """Get statistics about a server's MSPT over a window of time
+
+    The window is given in seconds by the `window` query parameter, and is an hour by default.
+    """
+    try:
+        server = request.app.config.BOT_INSTANCE.servers[name]
+        window = float(request.args.get("window", DEFAULT_TPS_WINDOW))
+    except ServerNotFound:
+        return json_response({"error": "No server found!"}, status=404)
+    except ValueError:
+        return json_response({"error": "Invalid window!"}, status=400)
+
+    stats = server.tps_history.stats(window) if server.tps_history else None
+    if not stats:
+        return json_response({"error": "No TPS history for this window!"}, status=404)
+
+    return json_response({"res": stats.serialize()})
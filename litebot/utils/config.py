@@ -85,7 +85,33 @@ class MainConfig(BaseConfig):
                 "rcon_port": 25575,
                 "rcon_password": "THE PASSWORD FOR RCON CONNECTION",
                 "operator": True,
-                "bridge_channel_id": 0
+                "bridge_channel_id": 0,
+                "rcon_pool_size": 2,
+                "rcon_idle_timeout": 300,
+                "rcon_pipeline_depth": 1,
+                "rcon_rate_limit": 0,
+                "rcon_timeout": 5,
+                "rcon_command_timeout": 60,
+                "status_method": "query",
+                "status_poll_interval": 0,
+                "status_poll_jitter": 0.1,
+                "roster_events": False,
+                "tps_sample_interval": 0,
+                "dispatch_concurrency": 8,
+                "ws_authenticate_once": False,
+                "event_queue_size": 1024,
+                "event_max_in_flight": 256,
+                "message_batch_window": 0.05,
+                "ws_compression_threshold": 1024,
+                "ws_max_frame_size": 4194304,
+                "event_policies": {
+                    "on_tick": "coalesce_latest"
+                },
+                "rcon_priority_limits": {
+                    "interactive": 4,
+                    "normal": 2,
+                    "background": 1
+                }
             }
         }
     }
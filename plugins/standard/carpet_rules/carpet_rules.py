@@ -1,5 +1,4 @@
 import json
-import re
 
 from discord.ext import commands, tasks
 from litebot.core import Cog, Context
@@ -8,12 +7,12 @@ from litebot.errors import ServerConnectionFailed
 from litebot.utils.requests import fetch
 from plugins.standard.carpet_rules import utils
 from plugins.standard.carpet_rules.utils import clean_values
-from plugins.standard.scoreboards import Scoreboard
 from plugins.standard.server_utils import get_server
 
 
 class CarpetRulesCommand(Cog):
     RULES_DATABASE_URL = "https://raw.githubusercontent.com/Crec0/carpet-rules-database/main/data/parsed_data.json"
+    RULES_CACHE_TTL = 30
 
     def __init__(self, bot):
         self._bot = bot
@@ -30,12 +29,9 @@ class CarpetRulesCommand(Cog):
         server = get_server(ctx, server)
         if not await self.try_sync_server(server, ctx):
             return
-        rules_ret = await server.send_command(
-            "script run encode_json(system_info('world_carpet_rules'))"
-        )
-        rules_ret = re.sub("^[^{]*", "", rules_ret)
-        rules_ret = re.sub("[^}]+$", "", rules_ret)
-        json_rules = json.loads(rules_ret)
+        rules_ret = await server.script_batch({"rules": "system_info('world_carpet_rules')"},
+                                              cache_ttl=CarpetRulesCommand.RULES_CACHE_TTL)
+        json_rules = rules_ret["rules"]
 
         modified_rules: dict = {
             "name": [],
@@ -67,8 +63,8 @@ class CarpetRulesCommand(Cog):
 
     async def try_sync_server(self, server: MinecraftServer, ctx: Context) -> bool:
         try:
-            res = server.send_sync_command("script run l = [];")
-            if Scoreboard.MISSING_COMMAND in res:
+            # The script command may have been enabled since the server was last probed
+            if not (await server.capabilities()).scarpet and not (await server.capabilities(fresh=True)).scarpet:
                 rep = f"Requirements not fulfilled for {self.__cog_name__}: " \
                       f"Carpet not installed/script command not enabled on {server.name}"
                 self._bot.logger.warning(rep)
@@ -29,4 +29,4 @@ class BridgeConnection:
 
 class ServerSuggester(StrictSuggester):
     async def suggest(self, ctx: ServerCommandContext) -> list:
-        return [s.name for s in ctx.bot.servers if s is not ctx.server and s.connected]
\ No newline at end of file
+        return [s.name for s in ctx.bot.servers if s is not ctx.server and s.server_connected]
\ No newline at end of file
@@ -4,7 +4,7 @@ from mongoengine import NotUniqueError
 from typing import Optional
 
 from litebot.core import Cog
-from litebot.core.minecraft import ServerCommandContext, Text, Colors, commands, Player
+from litebot.core.minecraft import ServerCommandContext, Text, Colors, commands, Player, CommandPriority
 from litebot.core.minecraft.commands.arguments import StringArgumentType, BlockPosArgumentType, DimensionArgumentType, \
     IntegerArgumentType, PlayerArgumentType
 from litebot.core.minecraft.commands.checks import check
@@ -106,7 +106,7 @@ class LocationCommand(Cog):
         """
         location = Location.objects(location_id=f"{ctx.server.name}_{name}").first()
         x, y, z = location.coordinates
-        await ctx.server.send_command(f"tp {ctx.player} {x} {y} {z}")
+        await ctx.server.send_command(f"tp {ctx.player} {x} {y} {z}", priority=CommandPriority.INTERACTIVE)
 
         await ctx.send(text=Text().add_component(text=f"Teleported to {name}", color=Colors.GRAY))
 
@@ -4,7 +4,8 @@ from typing import Optional
 
 from discord.ext import commands, tasks
 from litebot.core import Cog, Context
-from litebot.errors import ServerConnectionFailed
+from litebot.core.minecraft import CommandPriority
+from litebot.errors import MinecraftServerException, ServerConnectionFailed
 from litebot.utils.markdown import CODE_BLOCK
 from litebot.utils.requests import fetch
 from plugins.standard.scoreboards.utils import ScoreboardFlag, ScoreboardFlags, scoreboard_image
@@ -15,9 +16,9 @@ class Scoreboard(Cog):
         "for(scoreboard('{1}'), put(scores, '\"' + _ + '\"', scoreboard('{1}', _))); print(scores)"
     WHITELIST_ONLY_CMD = "script run scores = {0}; " + \
         "for(system_info('server_whitelist'), put(scores, '\"' + _ + '\"', scoreboard('{1}', _))); print(scores)"
-    GET_SCOREBOARDS = "script run scoreboard()"
+    GET_SCOREBOARDS = "scoreboard()"
     EVERY_SCOREBOARD_MAPPINGS = "https://raw.githubusercontent.com/samipourquoi/endbot/master/packages/endbot/assets/scoreboards.json"
-    MISSING_COMMAND = "Unknown or incomplete command"
+    SCORES_CACHE_TTL = 10
 
     def __init__(self, bot):
         self._server = next(iter(bot.servers.all))
@@ -46,7 +47,7 @@ class Scoreboard(Cog):
         except KeyError:
             pass
 
-        res = await self._server.send_command(cmd.format("{}", objective_name))
+        res = await self._server.send_command(cmd.format("{}", objective_name), cache_ttl=Scoreboard.SCORES_CACHE_TTL)
         scores = sorted({k: int(v) for k, v in json.loads(res.split("} ")[0] + "}").items() if v}.items(),
                         key=lambda x: x[1], reverse=True)
         scores = scores[:15] if flag == ScoreboardFlags.BOARD else scores
@@ -62,18 +63,18 @@ class Scoreboard(Cog):
     @tasks.loop(hours=72.0)
     async def _refresh_objectives(self):
         try:
-            objectives = await self._server.send_command(Scoreboard.GET_SCOREBOARDS)
-            self._objectives = objectives.split("] ")[0].removeprefix("[").split(", ")
-        except ServerConnectionFailed:
+            res = await self._server.script_batch({"objectives": Scoreboard.GET_SCOREBOARDS},
+                                                  priority=CommandPriority.BACKGROUND, cache_ttl=Scoreboard.SCORES_CACHE_TTL)
+            self._objectives = res["objectives"] or []
+        except MinecraftServerException:
             pass # Ah well, we'll try next time
 
         req = await fetch(url=Scoreboard.EVERY_SCOREBOARD_MAPPINGS)
         self._every_board_mappings = json.loads(await req.text())
 
-    def cog_requirements(self, bot):
+    async def cog_requirements(self, bot):
         try:
-            res = self._server.send_sync_command("script run l = [];")
-            if Scoreboard.MISSING_COMMAND in res:
+            if not (await self._server.capabilities()).scarpet:
                 bot.logger.warning(f"Requirements not fulfilled for {self.__cog_name__}: Carpet not installed/script command not enabled on {self._server.name}")
                 return False
             return True
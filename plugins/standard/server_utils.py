@@ -4,6 +4,8 @@ __plugin_meta__ = {
     "authors": ["iDarkLightning"]
 }
 
+import asyncio
+import re
 from datetime import datetime
 
 import discord
@@ -12,11 +14,14 @@ from discord.utils import escape_markdown
 
 from litebot.core import Cog, Context
 from litebot.errors import ServerNotRunningCarpet, ServerConnectionFailed
-from litebot.core.minecraft import MinecraftServer
-from litebot.utils.embeds import SuccessEmbed, ErrorEmbed
+from litebot.core.minecraft import MinecraftServer, CommandPriority
+from litebot.utils.embeds import SuccessEmbed, ErrorEmbed, InfoEmbed
 from litebot.utils.markdown import CODE_BLOCK
 from litebot.utils.role_utils import check_role
 
+STATUS_ALL_TIMEOUT = 5
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
 
 def get_server(ctx: commands.Context, name: str) -> MinecraftServer:
     if name:
@@ -24,6 +29,29 @@ def get_server(ctx: commands.Context, name: str) -> MinecraftServer:
     else:
         return ctx.bot.servers[ctx.channel.id]
 
+class Duration(commands.Converter):
+    """
+    Converts a duration like `30m` or `7d` into seconds
+    """
+    async def convert(self, ctx: commands.Context, argument: str) -> int:
+        match = re.fullmatch(r"(\d+)([smhd])", argument.lower())
+        if not match:
+            raise commands.BadArgument(f"Invalid duration `{argument}`, try something like `30m` or `7d`")
+
+        return int(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+def format_duration(seconds: int) -> str:
+    """Formats a number of seconds in the largest unit that fits it exactly, like `12h`
+
+    Args:
+        seconds: The number of seconds
+
+    Returns:
+        The formatted duration
+    """
+    unit, size = next((u, s) for u, s in sorted(DURATION_UNITS.items(), key=lambda u: -u[1]) if seconds % s == 0)
+    return f"{seconds // size}{unit}"
+
 class WhitelistActions:
     ADD = "```Whitelisted {player} on {} servers. OPed {player} on {} servers.```"
     REMOVE = "```Unwhitelisted {player} on {} servers. DEOPed {player} on {} servers.```"
@@ -38,24 +66,31 @@ class ServerUtils(Cog):
         """
         Allows you to view the status of a server.
         You must include the server name unless the command is run in a bridge channel.
+        Use `all` as the server name to view the status of every server at once.
         `server` The server to display the status for
         """
+        if server == "all" and server not in [s.name for s in self._bot.servers.all]:
+            return await self._status_all(ctx)
+
         server = get_server(ctx, server)
-        status = server.status()
+        status = await server.status()
         embed = SuccessEmbed(f"{server.name.upper()} Status") if \
             status.online else ErrorEmbed(f"{server.name.upper()} Status")
 
         embed.description = f"The server is currently {'online' if status.online else 'offline'}!"
-        embed.timestamp = datetime.utcnow()
+        embed.timestamp = datetime.utcfromtimestamp(server.snapshot.timestamp) if server.snapshot else datetime.utcnow()
 
         if status.online:
             try:
-                tps, mspt = await server.tps()
+                tps, mspt = server.snapshot.tps if server.snapshot and server.snapshot.tps else await server.tps()
                 embed.add_field(name="TPS", value=str(mspt), inline=True)
                 embed.add_field(name="MSPT", value=str(tps), inline=True)
             except ServerNotRunningCarpet:
                 pass
 
+            if status.latency is not None:
+                embed.add_field(name="Ping", value=f"{round(status.latency)}ms", inline=True)
+
             if len(status.players):
                 embed.add_field(name=f"Online Players ({status.players.online}/{status.players.max})",
                                 value=', '.join([escape_markdown(p) for p in status.players]), inline=False)
@@ -65,6 +100,46 @@ class ServerUtils(Cog):
 
         await ctx.send(embed=embed)
 
+    async def _status_all(self, ctx: Context) -> None:
+        async def fetch(server: MinecraftServer):
+            async def tps():
+                try:
+                    return server.snapshot.tps if server.snapshot and server.snapshot.tps else await server.tps()
+                except (ServerNotRunningCarpet, ServerConnectionFailed):
+                    return None
+
+            return await asyncio.gather(server.status(), tps())
+
+        # Every server shares the same deadline, even if it has to wait for its turn
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STATUS_ALL_TIMEOUT
+        results = await self._bot.servers.gather(
+            lambda s: asyncio.wait_for(fetch(s), max(0.0, deadline - loop.time())), timeout=None)
+
+        embed = InfoEmbed("Server Status")
+        embed.timestamp = datetime.utcnow()
+
+        for result in results:
+            if result.timed_out:
+                value = "Timed out"
+            elif not result.ok or not result.result[0].online:
+                value = "Offline"
+            else:
+                status, tps = result.result
+                value = f"Online ({status.players.online}/{status.players.max})"
+                if tps:
+                    value += f"\nTPS: {tps[1]} MSPT: {tps[0]}"
+                if len(status.players):
+                    value += f"\n{', '.join([escape_markdown(p) for p in status.players])}"
+
+            # Embed field values are capped at 1024 characters
+            embed.add_field(name=result.server.name.upper(), value=value[:1024], inline=False)
+
+        embed.set_thumbnail(url=ctx.guild.icon_url)
+        embed.set_footer(text=f"Requested by: {ctx.author.display_name}", icon_url=ctx.author.avatar_url)
+
+        await ctx.send(embed=embed)
+
     @Cog.setting(name="Run Command", description="Execute a command on the server via rcon!")
     @commands.command(name="run", aliases=["execute"])
     async def _run(self, ctx: Context, *args) -> None:
@@ -103,6 +178,46 @@ class ServerUtils(Cog):
         command = message.content.split("/")[1]
         await self._handle_server_command(message.channel, message.author, server, command)
 
+    @Cog.setting(name="TPS Command", description="View the TPS of a server, and how it has changed over time!")
+    @commands.group(name="tps", invoke_without_command=True)
+    async def _tps(self, ctx: Context, server: str = None) -> None:
+        """
+        Allows you to view the current TPS and MSPT of a server.
+        You must include the server name unless the command is run in a bridge channel.
+        `server` The server to display the TPS for
+        """
+        server = get_server(ctx, server)
+        mspt, tps = await server.tps(priority=CommandPriority.INTERACTIVE)
+
+        embed = InfoEmbed(f"{server.name.upper()} TPS", timestamp=datetime.utcnow())
+        embed.add_field(name="TPS", value=str(tps), inline=True)
+        embed.add_field(name="MSPT", value=str(mspt), inline=True)
+        await ctx.send(embed=embed)
+
+    @_tps.command(name="history")
+    async def _tps_history(self, ctx: Context, window: Duration = DURATION_UNITS["h"], server: str = None) -> None:
+        """
+        Allows you to view the TPS and MSPT of a server over a window of time.
+        This requires `tps_sample_interval` to be set for the server.
+        `window` How far back to look, such as `30m`, `12h` or `7d`
+        `server` The server to display the TPS history for
+        """
+        server = get_server(ctx, server)
+        stats = server.tps_history.stats(window) if server.tps_history else None
+        window = format_duration(window)
+
+        if not stats:
+            return await ctx.send(embed=ErrorEmbed(f"There is no TPS history for {server.name.upper()} in the last {window}!"))
+
+        embed = InfoEmbed(f"{server.name.upper()} TPS over the last {window}", timestamp=datetime.utcnow())
+        embed.add_field(name="TPS", value=str(stats.tps), inline=True)
+        embed.add_field(name="Mean MSPT", value=str(stats.mean), inline=True)
+        embed.add_field(name="Min/Max MSPT", value=f"{stats.min}/{stats.max}", inline=True)
+        percentiles = "MSPT Percentiles" + (f" (of {round(stats.resolution)}s means)" if stats.percentiles_of_means else "")
+        embed.add_field(name=percentiles, value=f"p50: {stats.p50} p95: {stats.p95} p99: {stats.p99}", inline=False)
+        embed.set_footer(text=f"{stats.samples} samples, every {round(stats.resolution)}s")
+        await ctx.send(embed=embed)
+
     @Cog.setting(
         name="Whitelist Command",
         description="Easily whitelist someone accross all servers! Also OPs them in servers with operator to set to False")
@@ -139,18 +254,17 @@ class ServerUtils(Cog):
         whitelists = []
         ops = []
 
-        for server in self._bot.servers.all:
-            try:
-                res = await server.send_command(cmds[0])
-                if player_name in res:
-                    whitelists.append(server.name)
-            except ServerConnectionFailed:
+        results = await self._bot.servers.gather_commands(lambda s: cmds if not s.operator else cmds[:1],
+                                                          priority=CommandPriority.INTERACTIVE)
+        for result in results:
+            if not result.ok:
                 continue
 
-            if not server.operator:
-                res = await server.send_command(cmds[1])
-                if "Nothing" not in res:
-                    ops.append(server.name)
+            if player_name in result.result[0]:
+                whitelists.append(result.server.name)
+
+            if len(result.result) > 1 and "Nothing" not in result.result[1]:
+                ops.append(result.server.name)
 
         return await ctx.send(action.format(len(whitelists), len(ops), player=player_name,))
 
@@ -158,13 +272,13 @@ class ServerUtils(Cog):
                                      server: MinecraftServer, command: str) -> None:
         if server.operator:
             if check_role(author, self._config["operators_role"]):
-                res = await server.send_command(command)
+                res = await server.send_command(command, priority=CommandPriority.INTERACTIVE)
                 if res:
                     await channel.send(CODE_BLOCK.format("", res))
             else:
                 raise commands.CheckFailure
         else:
-            res = await server.send_command(command)
+            res = await server.send_command(command, priority=CommandPriority.INTERACTIVE)
             if res:
                 await channel.send(CODE_BLOCK.format("", res))
 
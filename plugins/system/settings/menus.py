@@ -76,8 +76,7 @@ class SettingsMenu:
 
         self._cur.set_field_at(0, name="Enabled", value="True", inline=False)
 
-        for server in self._ctx.bot.servers:
-            await server.send_command_tree()
+        await self._ctx.bot.servers.gather(lambda s: s.send_command_tree())
 
         await self._message.edit(embed=self._cur, components=[components])
 
@@ -93,8 +92,7 @@ class SettingsMenu:
 
         self._cur.set_field_at(0, name="Enabled", value="False", inline=False)
 
-        for server in self._ctx.bot.servers:
-            await server.send_command_tree()
+        await self._ctx.bot.servers.gather(lambda s: s.send_command_tree())
 
         await self._message.edit(embed=self._cur, components=[components])
 
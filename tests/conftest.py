@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+# The bot's loggers open a file in the logs directory as soon as they are imported
+os.makedirs(os.path.join(os.getcwd(), "logs"), exist_ok=True)
+
+
+@pytest.fixture
+def lta():
+    """
+    Makes an `LtaHarness`, which has to be entered inside of the event loop the test runs.
+    Tests using it are skipped when the bot's web dependencies aren't installed
+    """
+    for module in ("sanic", "websockets", "jwt", "discord", "discord_components"):
+        pytest.importorskip(module)
+
+    from .harness import LtaHarness
+    return LtaHarness
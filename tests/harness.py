@@ -0,0 +1,125 @@
+"""
+Runs a server's LiteBot-Mod connection end to end, against `benchmarks.emulator`
+
+The bot's `/server/` route is served by sanic on a free port, and its `MinecraftServer` sends RCON
+commands to a `MinecraftEmulator`, so frames go through the same dispatcher, event queue, batcher and codecs
+as they do in production. Only discord and the database are left out, see `EmulatedBot`.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import socket
+from typing import Callable, Optional
+
+from sanic import Sanic
+
+from benchmarks.emulator import LiteBotModClient, MinecraftEmulator
+from litebot.core.minecraft import MinecraftServer, ServerContainer
+from litebot.core.minecraft.commands import ServerCommand
+from litebot.server.routes.server_route import blueprint
+
+API_SECRET = "emulator-secret"
+SERVER_NAME = "emulator"
+
+_app_ids = itertools.count()
+
+
+class EmulatedBot:
+    """The parts of `LiteBot` that a `MinecraftServer` and the server route use
+
+    Args:
+        loop: The event loop the servers run on
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.logger = logging.getLogger("bot")
+        self.config = {"api_secret": API_SECRET}
+        self.using_lta = True
+        self.servers = ServerContainer(loop)
+        self.server_commands: dict[str, ServerCommand] = {}
+        self.server_events: dict[str, list[Callable]] = {}
+        self.rpc_handlers: dict[str, Callable] = {}
+        # The discord events dispatched by the servers, such as `server_up`
+        self.dispatched: list[tuple] = []
+
+    @property
+    def subscribed_events(self) -> list[str]:
+        return sorted(name for name, listeners in self.server_events.items() if listeners)
+
+    def add_command(self, command: ServerCommand) -> None:
+        self.server_commands[command.full_name] = command
+
+    def add_server_listener(self, func: Callable, name: str) -> None:
+        self.server_events.setdefault(name, []).append(func)
+
+    def add_rpc_handler(self, handler: Callable, name: str) -> None:
+        self.rpc_handlers[name] = handler
+
+    def dispatch(self, event_name: str, *args) -> None:
+        self.dispatched.append((event_name, *args))
+
+    def get_channel(self, id_: int) -> None:
+        return None
+
+
+class LtaHarness:
+    """Runs the bot's side of LiteBot-Mod against the emulator
+
+    Commands, listeners and RPC handlers should be added to `bot` before connecting a client,
+    so that they are part of the command tree and event subscriptions it is sent.
+
+    Args:
+        **server_info: Settings for the server, as in the `servers` section of the config
+    """
+
+    def __init__(self, **server_info):
+        self.server_info = server_info
+        self.emulator = MinecraftEmulator()
+        self.bot: Optional[EmulatedBot] = None
+        self.server: Optional[MinecraftServer] = None
+        self.url: Optional[str] = None
+
+        self._http = None
+
+    async def __aenter__(self) -> LtaHarness:
+        await self.emulator.start()
+
+        self.bot = EmulatedBot(asyncio.get_running_loop())
+        self.server = MinecraftServer(SERVER_NAME, self.bot, operator=True, bridge_channel_id=0,
+                                      numerical_server_ip=self.emulator.host, server_port=self.emulator.query_port,
+                                      rcon_port=self.emulator.rcon_port, rcon_password=self.emulator.rcon_password,
+                                      **self.server_info)
+        self.bot.servers.append(self.server)
+
+        app = Sanic(f"LiteBot-API-{next(_app_ids)}")
+        app.config.BOT_INSTANCE = self.bot
+        app.blueprint(blueprint)
+
+        port = _free_port(self.emulator.host)
+        self._http = await app.create_server(host=self.emulator.host, port=port, return_asyncio_server=True,
+                                             access_log=False)
+        self.url = f"ws://{self.emulator.host}:{port}/server/"
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self._http is not None:
+            self._http.close()
+            await self._http.wait_closed()
+
+        self.bot.servers.close()
+        await self.emulator.stop()
+
+    def client(self, **kwargs) -> LiteBotModClient:
+        """
+        A LiteBot-Mod client for the server, see `LiteBotModClient` for the arguments
+        """
+        return LiteBotModClient(self.url, API_SECRET, SERVER_NAME, **kwargs)
+
+
+def _free_port(host: str) -> int:
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
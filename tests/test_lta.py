@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("discord")
+pytest.importorskip("discord_components")
+
+from litebot.core.minecraft.commands import command
+from litebot.core.minecraft.text import Text
+
+PLAYER = {"name": "Steve", "uuid": "8667ba71-b85a-4004-af54-457a9734eed7", "pos_x": 0, "pos_y": 64, "pos_z": 0,
+          "dimension": "minecraft:overworld", "op_level": 4}
+
+CODEC_OFFERS = [
+    # Mod versions that don't negotiate a codec
+    {},
+    {"codecs": ["msgpack", "json"], "compression": ["deflate"]},
+]
+
+
+def _text(frame: dict) -> str:
+    # Messages are components for negotiated codecs, and a built `Text` otherwise
+    return json.dumps(frame["data"]["message"])
+
+
+@pytest.mark.parametrize("offer", CODEC_OFFERS)
+def test_connect_event_command(lta, offer):
+    async def run():
+        async with lta(message_batch_window=0.05) as harness:
+            harness.emulator.commands["list"] = lambda _: "There are 0 of a max of 20 players online:"
+            heard = []
+
+            async def on_message(ctx, payload):
+                heard.append((ctx.player.name, payload.message))
+                await ctx.server.send_message(Text.from_str(f"<{ctx.player.name}> echo: {payload.message}"))
+
+            @command(name="online")
+            async def online(ctx):
+                ctx["list"] = await ctx.server.send_command("list")
+                # Sent to different targets within one window, so they share a `messages` frame
+                await ctx.send("Looking it up")
+                await ctx.server.send_message(Text.from_str(f"{ctx.player.name} asked who is online"))
+
+            harness.bot.add_server_listener(on_message, "on_message")
+            harness.bot.add_command(online)
+
+            async with harness.client(**offer) as client:
+                [tree] = await client.wait_for("server_command_registers")
+                assert [c["name"] for c in tree["data"]] == ["online"]
+                await client.wait_for("server_event_subscriptions")
+                assert client.subscriptions == {"on_message"}
+                assert harness.server.server_connected
+                assert (client.codec is not None) == bool(offer)
+
+                # Events without listeners aren't sent at all
+                await client.event("on_tick")
+                await client.event("on_message", PLAYER, {"message": "hello"})
+                [echo] = await client.wait_for("message")
+                assert heard == [("Steve", "hello")]
+                assert "echo: hello" in _text(echo)
+                assert client.batches == [1]
+
+                await client.command("online", PLAYER)
+                [after] = await client.wait_for("server_command_after_invoke")
+                assert after["data"] == {"name": "online", "args": {"list": "There are 0 of a max of 20 players online:"}}
+                assert harness.emulator.rcon_commands == 1
+
+                # The batch is flushed before the after invoke frame, so it has already arrived
+                assert client.batches == [1, 2]
+                reply, announcement = client.received[-3:-1]
+                assert reply["data"]["player"] == PLAYER["uuid"] and "Looking it up" in _text(reply)
+                assert "player" not in announcement["data"] and "asked who is online" in _text(announcement)
+                assert harness.server.event_stats.dropped == 0
+
+            # The route hands the connection back once the client has gone
+            for _ in range(50):
+                if not harness.server.server_connected:
+                    break
+                await asyncio.sleep(0.1)
+            assert not harness.server.server_connected
+
+    asyncio.run(run())